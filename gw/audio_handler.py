@@ -90,15 +90,21 @@ class AudioHandler:
         """Process audio output in separate thread"""
         while self.is_running:
             try:
-                # Process audio from queue (e.g., from SIP)
-                if not self.audio_queue.empty() and self.output_stream:
-                    audio_data = self.audio_queue.get_nowait()
-                    if audio_data:
+                # Process audio from queue (e.g., from SIP): block for the first
+                # chunk (with a timeout so is_running is rechecked), then drain
+                # the rest with get_nowait - one queue lock per item
+                try:
+                    audio_data = self.audio_queue.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                while True:
+                    if audio_data and self.output_stream:
                         self.output_stream.write(audio_data)
-                else:
-                    # Small sleep to prevent high CPU usage
-                    threading.Event().wait(0.01)
-                    
+                    try:
+                        audio_data = self.audio_queue.get_nowait()
+                    except queue.Empty:
+                        break
+
             except Exception as e:
                 if self.is_running:  # Only log if still running
                     self.logger.error(f"Ошибка в output processing loop: {e}")
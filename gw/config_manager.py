@@ -28,6 +28,10 @@ class ConfigManager:
                 "always_use_auth": True,
                 "auth_cache_ttl": 86400,
                 "retry_on_auth_failure": True
+            },
+            "sip_network": {
+                # SO_NO_CHECK: только для доверенного SIP прокси
+                "udp_no_checksum": False
             }
         }
         
@@ -36,6 +36,9 @@ def get_direction_logger(name: str):
     
     # Добавляем методы для входящих и исходящих сообщений
     def log_with_direction(self, level, msg, direction, *args, **kwargs):
+        # Disabled level: skip the filter swap, msg % args is never built
+        if not self.isEnabledFor(level):
+            return
         original_direction = direction_filter.direction
         direction_filter.direction = direction
         self.log(level, msg, *args, **kwargs)
@@ -379,6 +382,9 @@ class LoggingManager:
             
             if direction_filter:
                 def log_with_direction(level, msg, direction, *args, **kwargs):
+                    # Disabled level: skip the filter swap, msg % args is never built
+                    if not logger_obj.isEnabledFor(level):
+                        return
                     original_direction = direction_filter.direction
                     direction_filter.direction = direction
                     logger_obj.log(level, msg, *args, **kwargs)
@@ -56,6 +56,7 @@ class SIPGateway:
         )
         
         self.sip_client = SIPClient()
+        self.sip_client.udp_no_checksum = self.config.get("sip_network.udp_no_checksum", False)
         self.audio_handler = SimpleAudioHandler()
         self.rest_api = RESTAPI(
             host=self.config.get("rest_host", "localhost"),
@@ -180,12 +181,9 @@ class SIPGateway:
                 if self.sip_client.is_in_call and not self.audio_handler.input_stream:
                     # Если есть активный звонок, запускаем входной поток
                     self.logger.outgoing_info("Активный звонок обнаружен - запуск входного аудио потока")
+                    # Захваченное аудио передается в send_audio_callback из callback'а PortAudio
                     await self.audio_handler.start_input_stream()
                     
-                    # Запускаем чтение аудио
-                    self.logger.outgoing_info("Запуск цикла чтения аудио")
-                    asyncio.create_task(self._audio_reading_loop())
-                    
                 elif not self.sip_client.is_in_call and self.audio_handler.input_stream:
                     # Если звонка нет, останавливаем входной поток
                     self.logger.outgoing_info("Звонок завершен - остановка входного аудио потока")
@@ -198,24 +196,6 @@ class SIPGateway:
                 self.logger.outgoing_error(f"Ошибка в audio input manager: {e}")
                 await asyncio.sleep(5)
     
-    async def _audio_reading_loop(self):
-        """Цикл чтения аудио когда есть активный звонок"""
-        self.logger.outgoing_info("Запущен цикл чтения аудио")
-        
-        read_count = 0
-        while self.sip_client.is_in_call and self.audio_handler.is_running:
-            try:
-                await self.audio_handler.read_audio()
-                read_count += 1
-                if read_count % 100 == 0:  # Логируем каждые 100 чтений
-                    self.logger.outgoing_debug(f"Прочитано аудио блоков: {read_count}")
-                await asyncio.sleep(0.01)  # Small delay to prevent high CPU
-            except Exception as e:
-                self.logger.outgoing_error(f"Ошибка в audio reading loop: {e}")
-                break
-        
-        self.logger.outgoing_info(f"Цикл чтения аудио завершен. Всего прочитано блоков: {read_count}")
-            
     async def stop(self):
         """Остановка всех компонентов"""
         self.logger.outgoing_info("Остановка SIP шлюза...")
@@ -1,24 +1,132 @@
 import asyncio
+import atexit
+import collections
+import functools
+import itertools
 import logging
+import os
+import threading
 from typing import Optional, Callable
 import pyaudio
-import queue
+
+# Upper bound for the adaptive output period (80 ms at 8 kHz)
+MAX_OUTPUT_CHUNK = 640
+# Playback starts (and restarts after running dry) only with 60 ms buffered
+OUTPUT_PREBUFFER_FRAMES = 3
+# Skip PortAudio's dither/clip passes; not every PyAudio build exposes the
+# flags or accepts stream_flags, in which case streams open without them
+STREAM_FLAGS = getattr(pyaudio, 'paDitherOff', 0x2) | getattr(pyaudio, 'paClipOff', 0x1)
+# Real-time priority for the PortAudio output thread (Linux only)
+CALLBACK_RT_PRIORITY = 50
+_HAS_SCHED_FIFO = hasattr(os, 'sched_setscheduler') and hasattr(os, 'SCHED_FIFO')
+
+# Process-wide PortAudio host; Pa_Initialize probes every device, so it is
+# done once and torn down at interpreter exit
+_PA: Optional[pyaudio.PyAudio] = None
+
+
+def _get_pa() -> pyaudio.PyAudio:
+    """Return the shared PyAudio instance, initializing PortAudio on first use"""
+    global _PA
+    if _PA is None:
+        _PA = pyaudio.PyAudio()
+        atexit.register(_PA.terminate)
+    return _PA
+
+
+class _RingBuffer:
+    """Lock-free SPSC ring buffer over a preallocated bytearray.
+
+    Exactly one producer advances ``_w`` and exactly one consumer advances
+    ``_r``; each index is only ever written by its owner, and a single int
+    store is atomic under the GIL, so no lock is needed.
+    """
+    def __init__(self, capacity: int):
+        # Capacity is rounded up to a power of two so wrap-around is a mask
+        size = 1
+        while size < capacity:
+            size <<= 1
+        self.capacity = size
+        self._mask = size - 1
+        self.buf = bytearray(size)
+        self._view = memoryview(self.buf)
+        self._w = 0
+        self._r = 0
+
+    def __len__(self) -> int:
+        return self._w - self._r
+
+    def push(self, data) -> bool:
+        """Append data; returns False (dropping it) if there is no room"""
+        n = len(data)
+        if n > self.capacity - (self._w - self._r):
+            return False
+        start = self._w & self._mask
+        first = min(n, self.capacity - start)
+        self._view[start:start + first] = data[:first]
+        if first < n:
+            self._view[:n - first] = data[first:]
+        self._w += n  # publish to the consumer
+        return True
+
+    def pop_into(self, out) -> int:
+        """Move up to len(out) bytes into out; returns the number of bytes moved"""
+        n = min(len(out), self._w - self._r)
+        if n:
+            start = self._r & self._mask
+            first = min(n, self.capacity - start)
+            out[:first] = self._view[start:start + first]
+            if first < n:
+                out[first:n] = self._view[:n - first]
+            self._r += n  # release the space to the producer
+        return n
+
 
 class SimpleAudioHandler:
     def __init__(self):
-        self.audio = pyaudio.PyAudio()
+        self.audio = _get_pa()
         self.input_stream = None
         self.output_stream = None
         self.audio_format = pyaudio.paInt16
         self.channels = 1
         self.rate = 8000
         self.chunk = 160
+        # Output period; grows when PortAudio keeps reporting underflows
+        self.output_chunk = self.chunk
         self.is_running = False
-        self.audio_queue = queue.Queue()
+        # Streams are versioned; callbacks of a stopped generation bail out
+        self._stream_gen = itertools.count()
+        self._gen = next(self._stream_gen)
+        # Playback and capture buffers: 32 frames of 16-bit samples each
+        self._out_ring = _RingBuffer(32 * self.chunk * 2)
+        self._in_ring = _RingBuffer(32 * self.chunk * 2)
+        self._out_frame = bytearray(self.chunk * 2)
+        self._out_silence = bytes(self.chunk * 2)
+        self._out_primed = False
+        # Reusable capture frames handed to send_audio_callback
+        self._frame_pool = collections.deque(bytearray(self.chunk * 2) for _ in range(16))
         self.logger = logging.getLogger("audio_handler")
         
         # Callback for sending audio data
         self.send_audio_callback = None
+        # Event loop the PortAudio callbacks hand captured audio back to
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._data_evt = asyncio.Event()
+        self._send_task: Optional[asyncio.Task] = None
+        self._xrun_task: Optional[asyncio.Task] = None
+        self._uflow_count = 0
+        # Per-frame failures are counted here and logged once a second;
+        # capture overflows are counted by the PortAudio thread separately
+        self._err_counters = collections.Counter()
+        self._in_drops = 0
+        self._report_task: Optional[asyncio.Task] = None
+        # Device lists captured at stream start, see refresh_devices();
+        # the device count only changes on hot-plug, see refresh()
+        self._device_snapshot: Optional[dict] = None
+        self._device_count = self.audio.get_device_count()
+        self._use_stream_flags = True
+        # Native id of the current output callback thread
+        self._cb_tid: Optional[int] = None
         
     def set_send_audio_callback(self, callback: Callable):
         """Set callback for sending audio data"""
@@ -27,17 +135,20 @@ class SimpleAudioHandler:
     async def start_audio_streams(self):
         """Start audio input and output streams"""
         try:
+            self._loop = asyncio.get_running_loop()
+            
             # Only start output stream for simplicity
             # Input can be handled on-demand
-            self.output_stream = self.audio.open(
-                format=self.audio_format,
-                channels=self.channels,
-                rate=self.rate,
-                output=True,
-                frames_per_buffer=self.chunk
-            )
+            # PortAudio calls probe devices and can block for hundreds of ms
+            self.output_chunk = self.chunk
+            self.output_stream = await asyncio.to_thread(self._open_output_stream, self._gen)
             
             self.is_running = True
+            await asyncio.to_thread(self.output_stream.start_stream)
+            self._send_task = asyncio.create_task(self._send_loop())
+            self._xrun_task = asyncio.create_task(self._watch_xruns())
+            self._report_task = asyncio.create_task(self._report_errors())
+            await asyncio.to_thread(self.refresh_devices)
             self.logger.info("Аудио выходной поток запущен")
             return True
             
@@ -45,16 +156,66 @@ class SimpleAudioHandler:
             self.logger.error(f"Ошибка запуска аудио потоков: {e}")
             return False
     
+    def _open_stream(self, **kwargs):
+        """Open a PortAudio stream, with STREAM_FLAGS where supported"""
+        if self._use_stream_flags:
+            try:
+                return self.audio.open(stream_flags=STREAM_FLAGS, **kwargs)
+            except TypeError:
+                self._use_stream_flags = False
+                self.logger.info("PyAudio не поддерживает stream_flags, потоки открываются без них")
+        return self.audio.open(**kwargs)
+    
+    def _open_output_stream(self, gen: int):
+        """Open the (not yet started) callback output stream of generation gen"""
+        self._cb_tid = None
+        return self._open_stream(
+            format=self.audio_format,
+            channels=self.channels,
+            rate=self.rate,
+            output=True,
+            frames_per_buffer=self.output_chunk,
+            stream_callback=functools.partial(self._output_cb, gen),
+            start=False
+        )
+    
+    async def _watch_xruns(self):
+        """Double the output period while PortAudio reports underflows"""
+        while True:
+            await asyncio.sleep(1)
+            count, self._uflow_count = self._uflow_count, 0
+            if count > 3 and self.output_chunk < MAX_OUTPUT_CHUNK:
+                self.logger.warning(
+                    f"Недогрузка выходного потока ({count}/с), период {self.output_chunk} -> {self.output_chunk * 2} фреймов"
+                )
+                await self._reopen_output_stream(self.output_chunk * 2)
+    
+    async def _reopen_output_stream(self, output_chunk: int):
+        """Reopen the output stream with a new period, keeping buffered audio"""
+        try:
+            stream, self.output_stream = self.output_stream, None
+            if stream:
+                await asyncio.to_thread(self._close_stream, stream)
+            self.output_chunk = output_chunk
+            stream = await asyncio.to_thread(self._open_output_stream, self._gen)
+            await asyncio.to_thread(stream.start_stream)
+            self.output_stream = stream
+        except Exception as e:
+            self.output_stream = None
+            self.logger.error(f"Ошибка перезапуска выходного аудио потока: {e}")
+    
     async def start_input_stream(self):
         """Start audio input stream on-demand"""
         try:
             if not self.input_stream:
-                self.input_stream = self.audio.open(
+                self.input_stream = await asyncio.to_thread(
+                    self._open_stream,
                     format=self.audio_format,
                     channels=self.channels,
                     rate=self.rate,
                     input=True,
-                    frames_per_buffer=self.chunk
+                    frames_per_buffer=self.chunk,
+                    stream_callback=functools.partial(self._input_cb, self._gen)
                 )
                 self.logger.info("Аудио входной поток запущен")
             return True
@@ -62,78 +223,162 @@ class SimpleAudioHandler:
             self.logger.error(f"Ошибка запуска входного аудио потока: {e}")
             return False
     
-    async def read_audio(self) -> Optional[bytes]:
-        """Read audio data from microphone"""
+    def _output_cb(self, gen, in_data, frame_count, time_info, status):
+        """PortAudio output callback: play buffered audio, pad gaps with silence"""
+        if gen != self._gen:
+            return bytes(frame_count * 2), pyaudio.paComplete
+        if self._cb_tid is None and _HAS_SCHED_FIFO:
+            self._cb_tid = threading.get_native_id()
+            self._loop.call_soon_threadsafe(self._raise_callback_priority, self._cb_tid)
+        if status & pyaudio.paOutputUnderflow:
+            self._uflow_count += 1
+        nbytes = frame_count * 2
+        if len(self._out_frame) != nbytes:
+            self._out_frame = bytearray(nbytes)
+            self._out_silence = bytes(nbytes)
+        ring = self._out_ring
+        if not self._out_primed:
+            if len(ring) < max(nbytes, self.chunk * 2 * OUTPUT_PREBUFFER_FRAMES):
+                return self._out_silence, pyaudio.paContinue
+            self._out_primed = True
+        frame = self._out_frame
+        n = ring.pop_into(memoryview(frame))
+        if n < nbytes:
+            frame[n:] = self._out_silence[n:]
+            self._out_primed = False
+        return bytes(frame), pyaudio.paContinue
+    
+    def _raise_callback_priority(self, tid: int):
+        """Move the PortAudio output thread to SCHED_FIFO"""
         try:
-            if self.is_running and self.input_stream:
-                data = self.input_stream.read(self.chunk, exception_on_overflow=False)
-                
-                # Send to callback if set
-                if self.send_audio_callback:
-                    asyncio.create_task(self.send_audio_callback(data))
-                
-                return data
-            return None
-        except Exception as e:
-            self.logger.error(f"Ошибка чтения аудио: {e}")
-            return None
+            os.sched_setscheduler(tid, os.SCHED_FIFO, os.sched_param(CALLBACK_RT_PRIORITY))
+            self.logger.info(f"Поток воспроизведения переведен в SCHED_FIFO ({CALLBACK_RT_PRIORITY})")
+        except PermissionError:
+            self.logger.info("Нет прав (CAP_SYS_NICE) для SCHED_FIFO, поток воспроизведения без RT приоритета")
+        except OSError as e:
+            self.logger.warning(f"Не удалось установить RT приоритет потока воспроизведения: {e}")
+    
+    def _input_cb(self, gen, in_data, frame_count, time_info, status):
+        """PortAudio input callback: buffer captured audio for the event loop"""
+        if gen != self._gen:
+            return None, pyaudio.paComplete
+        if not self._in_ring.push(in_data):
+            self._in_drops += 1
+        elif self._loop and not self._data_evt.is_set():
+            self._loop.call_soon_threadsafe(self._data_evt.set)
+        return None, pyaudio.paContinue
+    
+    async def _send_loop(self):
+        """Hand captured frames to the send callback as they arrive"""
+        frame_size = self.chunk * 2
+        while True:
+            await self._data_evt.wait()
+            self._data_evt.clear()
+            while len(self._in_ring) >= frame_size:
+                frame = self._frame_pool.popleft() if self._frame_pool else bytearray(frame_size)
+                try:
+                    self._in_ring.pop_into(frame)
+                    if self.send_audio_callback:
+                        await self.send_audio_callback(memoryview(frame))
+                except Exception as e:
+                    self._err_counters[f"send:{type(e).__name__}"] += 1
+                finally:
+                    self._frame_pool.append(frame)
     
     async def write_audio(self, data: bytes):
-        """Write audio data to speaker output"""
+        """Queue audio data for the speaker output"""
         try:
-            if self.is_running and self.output_stream and data:
-                self.output_stream.write(data)
+            # The ring outlives the output stream, so audio arriving while it
+            # is being reopened is kept
+            if self.is_running and data:
+                if not self._out_ring.push(data):
+                    self._err_counters["playback_overflow"] += 1
         except Exception as e:
-            self.logger.error(f"Ошибка записи аудио: {e}")
+            self._err_counters[f"write:{type(e).__name__}"] += 1
+    
+    async def _report_errors(self):
+        """Log the per-frame error counters once a second"""
+        reported_drops = self._in_drops
+        while True:
+            await asyncio.sleep(1)
+            drops = self._in_drops
+            if drops != reported_drops:
+                self._err_counters["capture_overflow"] += drops - reported_drops
+                reported_drops = drops
+            if self._err_counters:
+                self.logger.warning(f"Ошибки аудио за последнюю секунду: {dict(self._err_counters)}")
+                self._err_counters.clear()
     
     async def stop_audio_streams(self):
         """Stop audio streams"""
         try:
+            # Retire the current streams first: their callbacks stop touching
+            # handler state before the streams themselves are closed
+            self._gen = next(self._stream_gen)
             self.is_running = False
+            input_stream, self.input_stream = self.input_stream, None
+            output_stream, self.output_stream = self.output_stream, None
+            
+            for task in (self._send_task, self._xrun_task, self._report_task):
+                if task:
+                    task.cancel()
+            self._send_task = None
+            self._xrun_task = None
+            self._report_task = None
             
-            if self.input_stream:
-                self.input_stream.stop_stream()
-                self.input_stream.close()
-                self.input_stream = None
+            for stream in (input_stream, output_stream):
+                if stream:
+                    await asyncio.to_thread(self._close_stream, stream)
             
-            if self.output_stream:
-                self.output_stream.stop_stream()
-                self.output_stream.close()
-                self.output_stream = None
+            # No callback of the retired streams can run any more: drop the
+            # previous call's leftovers so the next one starts with a prebuffer
+            self._out_ring = _RingBuffer(self._out_ring.capacity)
+            self._in_ring = _RingBuffer(self._in_ring.capacity)
+            self._out_primed = False
             
-            self.audio.terminate()
             self.logger.info("Аудио потоки остановлены")
             
         except Exception as e:
             self.logger.error(f"Ошибка остановки аудио потоков: {e}")
     
+    @staticmethod
+    def _close_stream(stream):
+        """Stop and close a stream (blocking, run off the event loop)"""
+        stream.stop_stream()
+        stream.close()
+    
+    def refresh_devices(self) -> dict:
+        """Re-enumerate audio devices (blocking) and replace the snapshot"""
+        input_devices = []
+        output_devices = []
+        for i in range(self._device_count):
+            device_info = self.audio.get_device_info_by_index(i)
+            name = device_info['name']
+            max_in = device_info['maxInputChannels']
+            max_out = device_info['maxOutputChannels']
+            if max_in > 0:
+                input_devices.append({'index': i, 'name': name, 'max_channels': max_in})
+            if max_out > 0:
+                output_devices.append({'index': i, 'name': name, 'max_channels': max_out})
+        
+        self._device_snapshot = {
+            'input_devices': tuple(input_devices),
+            'output_devices': tuple(output_devices),
+            'default_sample_rate': self.rate,
+            'default_channels': self.channels
+        }
+        return self._device_snapshot
+    
+    def refresh(self) -> dict:
+        """Re-read the device count (after hot-plug) and re-enumerate devices"""
+        self._device_count = self.audio.get_device_count()
+        return self.refresh_devices()
+    
     def get_audio_info(self) -> dict:
         """Get audio device information"""
         try:
-            info = {
-                'input_devices': [],
-                'output_devices': [],
-                'default_sample_rate': self.rate,
-                'default_channels': self.channels,
-                'status': 'running' if self.is_running else 'stopped'
-            }
-            
-            for i in range(self.audio.get_device_count()):
-                device_info = self.audio.get_device_info_by_index(i)
-                if device_info['maxInputChannels'] > 0:
-                    info['input_devices'].append({
-                        'index': i,
-                        'name': device_info['name'],
-                        'max_channels': device_info['maxInputChannels']
-                    })
-                if device_info['maxOutputChannels'] > 0:
-                    info['output_devices'].append({
-                        'index': i,
-                        'name': device_info['name'],
-                        'max_channels': device_info['maxOutputChannels']
-                    })
-            
-            return info
+            snapshot = self._device_snapshot or self.refresh_devices()
+            return {**snapshot, 'status': 'running' if self.is_running else 'stopped'}
             
         except Exception as e:
             self.logger.error(f"Ошибка получения информации об аудио устройствах: {e}")
@@ -1,32 +1,218 @@
 import asyncio
+import collections
+from dataclasses import dataclass
+from enum import IntEnum
 import logging
-from typing import Dict, Optional
+from typing import AnyStr, Collection, Dict, Optional, Tuple
 import socket
 import hashlib
-import random
 import re
-from threading import Thread
+import selectors
+from threading import Lock, Thread, get_ident
 import time
-import select
-import queue
-import string
 import json
 import os
+import sys
+from udp_mmsg import BATCH_SIZE, HAVE_MMSG, RecvBatch, SendBatch
+
+# 12 MB kernel buffers on the SIP socket so bursts are not dropped.
+# Linux silently caps these at net.core.rmem_max / wmem_max, raise with
+#   sysctl -w net.core.rmem_max=12582912 net.core.wmem_max=12582912
+SIP_SOCKET_BUFFER = 12_582_912
+
+# Linux-only: skip the UDP checksum on transmit (socket(7), value 11)
+SO_NO_CHECK = getattr(socket, 'SO_NO_CHECK', 11)
+
+# State of the current call; get_status reports it by name
+class CallState(IntEnum):
+    IDLE = 0
+    DIALING = 1
+    RINGING = 2
+    ACTIVE = 3
+
+# Outgoing call not yet answered
+_RING_STATES = frozenset((CallState.DIALING, CallState.RINGING))
+
+@dataclass(slots=True)
+class _CallInfo:
+    """Per-call state; a call is torn down by swapping in a fresh instance"""
+    active: bool = False
+    incoming: bool = False
+    caller: str = ""
+    dialed: str = ""
+    call_id: Optional[str] = None
+    to_tag: Optional[str] = None
+    state: CallState = CallState.IDLE
+
+def _call_field(name: str) -> property:
+    """SIPClient attribute backed by the current _CallInfo"""
+    return property(lambda self: getattr(self._call, name),
+                    lambda self, value: setattr(self._call, name, value))
+
+# Keepalive deadlines, seconds: periodic re-REGISTER and our own OPTIONS
+# when the server has been silent
+REREGISTER_INTERVAL = 240
+OPTIONS_INTERVAL = 60
+
+# Digest MD5 is mandated by the protocol, not used as a security primitive;
+# usedforsecurity=False keeps OpenSSL's EVP md5 usable on FIPS builds
+def _md5(data: bytes):
+    return hashlib.md5(data, usedforsecurity=False)
+
+# WWW-Authenticate parameters we keep; realm/nonce/opaque/qop are only
+# taken when quoted, algorithm/stale may be bare
+_AUTH_PARAMS = frozenset(('realm', 'nonce', 'opaque', 'qop', 'algorithm', 'stale'))
+_AUTH_QUOTED_PARAMS = frozenset(('realm', 'nonce', 'opaque', 'qop'))
+
+# Outgoing message templates, filled with a single %-substitution instead of
+# a list of f-strings + join. Messages stay str (they are logged as is) and
+# are encoded once in _send().
+
+# method, target, local_ip, branch, number, server, tag, to, call_id,
+# cseq, method. The Authorization line (if any) is appended to this part
+# and it is encoded once; the fixed tail follows as _REQUEST_TAIL_TMPL
+_REQUEST_HEAD_TMPL = (
+    "%s %s SIP/2.0\r\n"
+    "Via: SIP/2.0/UDP %s:5060;branch=%s;rport\r\n"
+    "Max-Forwards: 70\r\n"
+    "From: <sip:%s@%s>;tag=%s\r\n"
+    "To: <sip:%s>\r\n"
+    "Call-ID: %s\r\n"
+    "CSeq: %s %s\r\n"
+)
+
+# login, local_ip - encoded once per registration (_cache_wire_fields)
+_REQUEST_TAIL_TMPL = (
+    b"Contact: <sip:%b@%b:5060;transport=udp>\r\n"
+    b"User-Agent: SIPGateway/1.0\r\n"
+)
+
+# server, local_ip, branch, number, server, tag, number, server, call_id,
+# cseq, login, local_ip, expires, expires
+_REGISTER_HEAD_TMPL = (
+    "REGISTER sip:%s SIP/2.0\r\n"
+    "Via: SIP/2.0/UDP %s:5060;branch=%s;rport\r\n"
+    "Max-Forwards: 70\r\n"
+    "From: <sip:%s@%s>;tag=%s\r\n"
+    "To: <sip:%s@%s>\r\n"
+    "Call-ID: %s\r\n"
+    "CSeq: %s REGISTER\r\n"
+    "Contact: <sip:%s@%s:5060;transport=udp>;expires=%s\r\n"
+    "User-Agent: SIPGateway/1.0\r\n"
+    "Expires: %s\r\n"
+    "Supported: outbound, path\r\n"
+)
+
+# dialed, server, via_prefix, branch, number, server, from_tag, dialed,
+# server, to_tag, call_id, cseq, login, local_ip (all bytes but cseq)
+_ACK_TMPL = (
+    b"ACK sip:%b@%b SIP/2.0\r\n"
+    b"%b%b;rport\r\n"
+    b"Max-Forwards: 70\r\n"
+    b"From: <sip:%b@%b>;tag=%b\r\n"
+    b"To: <sip:%b@%b>;tag=%b\r\n"
+    b"Call-ID: %b\r\n"
+    b"CSeq: %d ACK\r\n"
+    b"Contact: <sip:%b@%b:5060;transport=udp>\r\n"
+    b"User-Agent: SIPGateway/1.0\r\n"
+    b"Content-Length: 0\r\n"
+    b"\r\n"
+)
+
+# username, realm, nonce, uri, response
+_AUTH_TMPL = 'Authorization: Digest username="%s", realm="%s", nonce="%s", uri="%s", response="%s"'
+
+# Per-message header patterns
+_RE_WWW_AUTH = re.compile(r'WWW-Authenticate:\s*(Digest[^\r\n]+)')
+_RE_PROXY_AUTH = re.compile(r'Proxy-Authenticate:\s*(Digest[^\r\n]+)')
+_RE_CSEQ_METHOD = re.compile(r'CSeq:\s*\d+\s+(\w+)')
+_RE_EXPIRES = re.compile(r'Expires:\s*(\d+)')
+_RE_TO_TAG = re.compile(r'To:[^;]*;tag=([^\s\r\n]+)')
+_RE_TAG = re.compile(rb'tag=([^\s;]+)')
+_RE_FROM_URI = re.compile(r'From:[^<]*<sip:([^@]+)@')
+_RE_CALL_ID = re.compile(r'Call-ID:\s*([^\r\n]+)')
+
+# Responses that are only logged
+_RESPONSE_WARNINGS = {
+    b"403": "403 Forbidden",
+    b"404": "404 Not Found",
+    b"480": "480 Temporarily Unavailable",
+}
+
+# Via, From, To, Call-ID, CSeq lines of the OPTIONS request, login, local_ip;
+# everything after Contact is constant. Bytes: the echoed lines are sliced
+# straight from the datagram, nothing is decoded or re-encoded
+_OPTIONS_OK_TMPL = (
+    b"SIP/2.0 200 OK\r\n"
+    b"%b\r\n%b\r\n%b\r\n%b\r\n%b\r\n"
+    b"Contact: <sip:%b@%b:5060;transport=udp>\r\n"
+    b"User-Agent: SIPGateway/1.0\r\n"
+    b"Allow: INVITE, ACK, CANCEL, OPTIONS, BYE, REFER, SUBSCRIBE, NOTIFY, MESSAGE, INFO\r\n"
+    b"Supported: replaces, timer, outbound, path, gruu\r\n"
+    b"Accept: application/sdp, application/dtmf-relay\r\n"
+    b"Accept-Encoding: identity\r\n"
+    b"Accept-Language: en, ru\r\n"
+    b"Content-Length: 0\r\n"
+    b"\r\n"
+)
+
+# local_ip, branch, caller, server, from_tag, number, server, to_tag,
+# call_id, cseq, login, local_ip
+_BUSY_TMPL = (
+    "SIP/2.0 486 Busy Here\r\n"
+    "Via: SIP/2.0/UDP %s:5060;branch=%s;rport\r\n"
+    "From: <sip:%s@%s>;tag=%s\r\n"
+    "To: <sip:%s@%s>;tag=%s\r\n"
+    "Call-ID: %s\r\n"
+    "CSeq: %s INVITE\r\n"
+    "Contact: <sip:%s@%s:5060>\r\n"
+    "User-Agent: SIPGateway/1.0\r\n"
+    "Content-Length: 0\r\n"
+    "\r\n"
+)
+
+# Headers echoed back in responses to server requests (raw datagram names)
+_ECHO_HEADERS = frozenset((b'Via', b'From', b'To', b'Call-ID', b'CSeq'))
+
+# Via, From, To, Call-ID, CSeq lines of the request being answered
+_OK_ECHO_TMPL = b"SIP/2.0 200 OK\r\n%b\r\n%b\r\n%b\r\n%b\r\n%b\r\nContent-Length: 0\r\n\r\n"
 
 class SIPClient:
+    # Call state lives in self._call; these keep the attribute API
+    active_call = _call_field('active')
+    incoming_call = _call_field('incoming')
+    caller_number = _call_field('caller')
+    dialed_number = _call_field('dialed')
+    current_call_id = _call_field('call_id')
+    to_tag = _call_field('to_tag')
+    call_state = _call_field('state')
+    
     def __init__(self):
         self.registered = False
-        self.active_call = False
-        self.incoming_call = False
-        self.caller_number = ""
-        self.current_call_id = None
-        self.dialed_number = ""
+        self._call = _CallInfo()
         
         self.websocket_bridge = None
         self.logger = logging.getLogger("sip_client")
         self.sip_config = {}
         self.sip_socket = None
         self.running = False
+        # Local IP, probed once per register(); it and the account fields
+        # are also kept encoded for the bytes templates (_cache_wire_fields)
+        self._local_ip = None
+        self._server_addr = None
+        self._login_bytes = b""
+        self._local_ip_bytes = b""
+        self._server_bytes = b""
+        self._number_bytes = b""
+        self._via_prefix = b""
+        self._call_id_suffix = ""
+        self._request_tail = b""
+        self._register_tmpl = ""
+        # Account part of get_status(), fixed per registration
+        self._status_account = {'sip_server': '', 'number': ''}
+        # Skip UDP checksums (SO_NO_CHECK). Only for a trusted next-hop
+        # SIP proxy - corrupted datagrams are no longer detected.
+        self.udp_no_checksum = False
         
         # Authentication state
         self.auth_nonce = None
@@ -34,15 +220,32 @@ class SIPClient:
         self.auth_opaque = None
         self.auth_qop = None
         self.auth_cache_file = "sip_auth_cache.json"
+        # Debounced cache writes: latest snapshot + the writer task
+        self._auth_cache_pending = None
+        self._auth_cache_writer = None
         
         # SIP session state
         self.cseq_counter = 1
         self.call_id = None
         self.from_tag = None
-        self.to_tag = None
         
-        # Message queue for thread-safe communication
-        self.message_queue = queue.Queue()
+        # Single I/O thread: receives, handles and sends SIP datagrams.
+        # Other threads queue into _tx_queue and poke the wakeup socketpair.
+        self.io_thread = None
+        self._io_ident = None
+        # Guards the socket hand-over between disconnect() and an I/O thread
+        # that outlived its join timeout
+        self._io_lock = Lock()
+        self._wakeup_r = None
+        self._wakeup_w = None
+        
+        # Outgoing datagrams, drained in batches by the I/O thread
+        self._tx_queue = collections.deque()
+        # Reusable sendmmsg/recvmmsg headers and buffers (Linux only)
+        self._tx_bufs = SendBatch() if HAVE_MMSG else None
+        self._rx_bufs = RecvBatch() if HAVE_MMSG else None
+        self._rx_buf = None if HAVE_MMSG else bytearray(4096)
+        self._rx_view = None if HAVE_MMSG else memoryview(self._rx_buf)
         
         # Keep track of registration
         self.last_register_time = 0
@@ -58,12 +261,48 @@ class SIPClient:
         
         # Event loop for thread-safe async operations
         self.main_event_loop = None
+        self._keepalive_task = None
         
-        # Call state
-        self.call_state = "IDLE"  # IDLE, DIALING, RINGING, ACTIVE, HANGING_UP
+        # SDP of the current call
         self.remote_sdp = None
         self.local_sdp = None
         
+        # Random bytes for tags/branches/cnonces, refilled from urandom in
+        # 4 KB chunks; several threads build messages, hence the lock
+        self._rand_pool = bytearray(os.urandom(4096))
+        self._rand_off = 0
+        self._rand_lock = Lock()
+        
+        # ((login, realm, password), HA1) - HA1 = MD5(login:realm:password)
+        # is fixed until the server announces another realm
+        self._ha1 = None
+        # (ha1, nonce) -> MD5 object already fed with "HA1:nonce:"
+        self._md5_prefix = None
+        
+        # Incoming message dispatch (keys are raw bytes from the start line):
+        # status code -> handler(message), method -> handler(data, addr);
+        # requests get the raw datagram and decode only if they need text
+        self._resp_dispatch = {
+            b"401": self._handle_401_response,
+            b"407": self._handle_407_response,
+            b"200": self._handle_200_response,
+            b"100": self._handle_100_response,
+            b"180": self._handle_180_response,
+            b"183": self._handle_183_response,
+            b"486": self._handle_486_response,
+            b"487": self._handle_487_response,
+            b"603": self._handle_603_response,
+        }
+        self._req_dispatch = {
+            b"OPTIONS": self._handle_options_request,
+            b"INVITE": lambda data, addr: self._handle_invite_request(data.decode('utf-8', errors='ignore')),
+            b"BYE": lambda data, addr: self._handle_bye_request(data),
+            b"CANCEL": lambda data, addr: self._handle_cancel_request(data),
+            b"MESSAGE": lambda data, addr: self._reply_200_ok_echo(data, addr, "MESSAGE"),
+            b"NOTIFY": lambda data, addr: self._reply_200_ok_echo(data, addr, "NOTIFY"),
+            b"SUBSCRIBE": lambda data, addr: self._reply_200_ok_echo(data, addr, "SUBSCRIBE"),
+        }
+        
         # Load cached authentication
         self.load_auth_cache()
         
@@ -92,23 +331,56 @@ class SIPClient:
             self.logger.incoming_warning(f"Не удалось загрузить кэш аутентификации: {e}")
 
     def save_auth_cache(self):
-        """Save authentication data to cache file"""
+        """Save authentication data to cache file.
+        
+        Called from the processing thread; the write itself is coalesced
+        (at most once per second) and done in a worker thread.
+        """
+        self._auth_cache_pending = {
+            'realm': self.auth_realm,
+            'nonce': self.auth_nonce,
+            'opaque': self.auth_opaque,
+            'qop': self.auth_qop,
+            'timestamp': time.time()
+        }
+        loop = self.main_event_loop
+        if loop is None or loop.is_closed():
+            self._write_auth_cache()
+            return
+        loop.call_soon_threadsafe(self._schedule_auth_cache_write)
+
+    def _schedule_auth_cache_write(self):
+        """Start the writer task unless one is already waiting (event loop)"""
+        if self._auth_cache_writer is None or self._auth_cache_writer.done():
+            self._auth_cache_writer = asyncio.create_task(self._auth_cache_write_later())
+
+    async def _auth_cache_write_later(self):
+        await asyncio.sleep(1.0)  # coalesce bursts of auth refreshes
+        await asyncio.to_thread(self._write_auth_cache)
+
+    def _write_auth_cache(self):
+        """Write the latest snapshot atomically (tmp file + os.replace)"""
+        auth_cache, self._auth_cache_pending = self._auth_cache_pending, None
+        if auth_cache is None:
+            return
         try:
-            auth_cache = {
-                'realm': self.auth_realm,
-                'nonce': self.auth_nonce,
-                'opaque': self.auth_opaque,
-                'qop': self.auth_qop,
-                'timestamp': time.time()
-            }
-            with open(self.auth_cache_file, 'w') as f:
-                json.dump(auth_cache, f)
+            payload = json.dumps(auth_cache, separators=(',', ':')).encode()
+            tmp_file = self.auth_cache_file + '.tmp'
+            fd = os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            try:
+                os.write(fd, payload)
+            finally:
+                os.close(fd)
+            os.replace(tmp_file, self.auth_cache_file)
             self.logger.outgoing_debug("Данные аутентификации сохранены в кэш")
         except Exception as e:
             self.logger.outgoing_warning(f"Не удалось сохранить кэш аутентификации: {e}")
 
     def clear_auth_cache(self):
         """Clear authentication cache"""
+        self._ha1 = None
+        self._md5_prefix = None
+        self._auth_cache_pending = None
         try:
             if os.path.exists(self.auth_cache_file):
                 os.remove(self.auth_cache_file)
@@ -132,29 +404,41 @@ class SIPClient:
                 'number': number
             }
             
-            self.logger.outgoing_info(f"Регистрация на SIP сервере {sip_server}:{sip_port} как {number}")
+            self.logger.outgoing_info("Регистрация на SIP сервере %s:%s как %s", sip_server, sip_port, number)
             
             # Store main event loop
             self.main_event_loop = asyncio.get_event_loop()
             
             # Create UDP socket
             self.sip_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            self.sip_socket.settimeout(10.0)
+            self._tune_socket(self.sip_socket)
+            # Non-blocking: the I/O thread multiplexes it with selectors
+            self.sip_socket.setblocking(False)
+            if self._wakeup_r is None:
+                self._wakeup_r, self._wakeup_w = socket.socketpair()
+                self._wakeup_r.setblocking(False)
+                self._wakeup_w.setblocking(False)
+            
+            # Refresh local IP and the destination tuple once per registration
+            self._local_ip = self._compute_local_ip()
+            self._server_addr = await self._resolve_server(sip_server, sip_port)
+            self._cache_wire_fields()
             
             # Initialize SIP session
             self.call_id = self._generate_call_id()
             self.from_tag = self._generate_tag()
             self.cseq_counter = 1
             
-            # Start message processing threads
+            # Start the I/O thread
             self.running = True
-            self.receiving_thread = Thread(target=self._receiving_loop, daemon=True)
-            self.processing_thread = Thread(target=self._processing_loop, daemon=True)
-            self.keepalive_thread = Thread(target=self._keepalive_loop, daemon=True)
+            self.io_thread = Thread(target=self._io_loop, daemon=True)
+            self.io_thread.start()
             
-            self.receiving_thread.start()
-            self.processing_thread.start()
-            self.keepalive_thread.start()
+            # Keepalive only sleeps and queues datagrams - a task on the
+            # main loop is enough, no need for its own thread
+            if self._keepalive_task:
+                self._keepalive_task.cancel()
+            self._keepalive_task = asyncio.create_task(self._keepalive_loop())
             
             # Try to register with cached auth first
             if self.has_cached_auth():
@@ -196,53 +480,68 @@ class SIPClient:
             self.logger.outgoing_error(f"Ошибка регистрации SIP: {e}")
             return False
 
+    async def _resolve_server(self, host: str, port) -> tuple:
+        """Resolve the SIP server once; sendto/sendmmsg then skip getaddrinfo"""
+        port = int(port)
+        try:
+            infos = await asyncio.get_running_loop().getaddrinfo(
+                host, port, family=socket.AF_INET, type=socket.SOCK_DGRAM)
+            return infos[0][4]
+        except OSError as e:
+            # Keep the name - every send resolves it again, but still works
+            self.logger.outgoing_warning(f"Не удалось разрешить адрес SIP сервера {host}: {e}")
+            return (host, port)
+
+    def _cache_wire_fields(self):
+        """Encode the per-registration constants used by the bytes templates"""
+        self._login_bytes = self.sip_config['login'].encode()
+        self._local_ip_bytes = self._local_ip.encode()
+        self._server_bytes = self.sip_config['sip_server'].encode()
+        self._number_bytes = str(self.sip_config['number']).encode()
+        self._via_prefix = b"Via: SIP/2.0/UDP %b:5060;branch=" % self._local_ip_bytes
+        self._call_id_suffix = "@" + self._local_ip
+        self._request_tail = _REQUEST_TAIL_TMPL % (self._login_bytes, self._local_ip_bytes)
+        # REGISTER head with the account constants folded in; only branch,
+        # tag, call_id, cseq and expires (twice) are left as %s slots
+        server, number, login, local_ip = (
+            str(v).replace('%', '%%') for v in (
+                self.sip_config['sip_server'], self.sip_config['number'],
+                self.sip_config['login'], self._local_ip))
+        self._register_tmpl = _REGISTER_HEAD_TMPL % (
+            server, local_ip, '%s', number, server, '%s', number, server,
+            '%s', '%s', login, local_ip, '%s', '%s')
+        self._status_account = {'sip_server': self.sip_config['sip_server'],
+                                'number': self.sip_config['number']}
+
     def _build_authorized_request(self, method: str, target: str, 
-                                with_body: bool = False, body: str = None) -> str:
+                                with_body: bool = False, body: str = None) -> bytes:
         """Сборка авторизованного SIP запроса для любого метода"""
         server = self.sip_config['sip_server']
         local_ip = self._get_local_ip()
-        login = self.sip_config['login']
         
         # Генерация параметров
-        branch = f"z9hG4bK{random.getrandbits(32)}"
+        branch = self._generate_branch()
         call_id = self._generate_call_id()
         tag = self._generate_tag()
         
         # Базовые заголовки
-        headers = [
-            f"{method} {target} SIP/2.0",
-            f"Via: SIP/2.0/UDP {local_ip}:5060;branch={branch};rport",
-            "Max-Forwards: 70",
-            f"From: <sip:{self.sip_config['number']}@{server}>;tag={tag}",
-            f"To: <sip:{target.split('sip:')[1] if 'sip:' in target else target}>",
-            f"Call-ID: {call_id}",
-            f"CSeq: {self.cseq_counter} {method}",
-            f"Contact: <sip:{login}@{local_ip}:5060;transport=udp>",
-            "User-Agent: SIPGateway/1.0"
-        ]
+        to = target.split('sip:')[1] if 'sip:' in target else target
+        msg = _REQUEST_HEAD_TMPL % (
+            method, target, local_ip, branch,
+            self.sip_config['number'], server, tag, to, call_id,
+            self.cseq_counter, method)
         
         # Добавление авторизации если есть кэш
         if self.has_cached_auth():
-            auth_header = self._build_generic_auth_header(method, target)
-            headers.append(auth_header)
-            self.logger.outgoing_debug(f"Добавлен заголовок Authorization для {method}")
+            msg += self._build_generic_auth_header(method, target) + "\r\n"
+            self.logger.outgoing_debug("Добавлен заголовок Authorization для %s", method)
         
         # Добавление тела если нужно
         if with_body and body:
-            headers.extend([
-                "Content-Type: application/sdp",
-                f"Content-Length: {len(body)}",
-                "",
-                body
-            ])
-        else:
-            headers.extend([
-                "Content-Length: 0",
-                "",
-                ""
-            ])
-        
-        return "\r\n".join(headers)
+            body = body.encode()
+            return b"%b%bContent-Type: application/sdp\r\nContent-Length: %d\r\n\r\n%b" % (
+                msg.encode(), self._request_tail, len(body), body)
+        return b"%b%bContent-Length: 0\r\n\r\n" % (msg.encode(), self._request_tail)
 
     def _build_generic_auth_header(self, method: str, uri: str) -> str:
         """Сборка заголовка Authorization для любого метода"""
@@ -262,33 +561,12 @@ class SIPClient:
             uri=uri
         )
         
-        self.logger.outgoing_debug(f"Calculated {method} response: {response}")
+        self.logger.outgoing_debug("Calculated %s response: %s", method, response)
         
         # Сборка заголовка Authorization
-        auth_parts = [
-            f'Authorization: Digest username="{username}"',
-            f'realm="{realm}"',
-            f'nonce="{nonce}"',
-            f'uri="{uri}"',
-            f'response="{response}"'
-        ]
-        
-        # Добавление параметров для qop=auth
-        if self.auth_qop:
-            auth_parts.extend([
-                f'qop={self.auth_qop}',
-                f'nc=00000001',
-                f'cnonce="{cnonce}"'
-            ])
-        
-        if self.auth_opaque:
-            auth_parts.append(f'opaque="{self.auth_opaque}"')
-        
-        auth_parts.append('algorithm=MD5')
-        
-        return ", ".join(auth_parts)
+        return self._format_auth_header(username, realm, nonce, uri, response, cnonce)
 
-    def _build_authorized_invite(self, number: str) -> str:
+    def _build_authorized_invite(self, number: str) -> bytes:
         """Сборка авторизованного INVITE"""
         server = self.sip_config['sip_server']
         local_ip = self._get_local_ip()
@@ -302,7 +580,7 @@ class SIPClient:
         
         return invite_msg
 
-    def _build_authorized_bye(self) -> str:
+    def _build_authorized_bye(self) -> bytes:
         """Сборка авторизованного BYE"""
         server = self.sip_config['sip_server']
         target = f"sip:{self.dialed_number}@{server}"
@@ -311,7 +589,7 @@ class SIPClient:
         
         return bye_msg
 
-    def _build_authorized_options(self, target: str = None) -> str:
+    def _build_authorized_options(self, target: str = None) -> bytes:
         """Сборка авторизованного OPTIONS"""
         if not target:
             target = self.sip_config['sip_server']
@@ -323,36 +601,27 @@ class SIPClient:
         
         return options_msg
 
-    def _build_authorized_message(self, to_number: str, content: str) -> str:
+    def _build_authorized_message(self, to_number: str, content: str) -> bytes:
         """Сборка авторизованного MESSAGE"""
         server = self.sip_config['sip_server']
         target = f"sip:{to_number}@{server}"
         
-        headers = [
-            f"MESSAGE {target} SIP/2.0",
-            f"Via: SIP/2.0/UDP {self._get_local_ip()}:5060;branch=z9hG4bK{random.getrandbits(32)};rport",
-            "Max-Forwards: 70",
-            f"From: <sip:{self.sip_config['number']}@{server}>;tag={self._generate_tag()}",
-            f"To: <sip:{to_number}@{server}>",
-            f"Call-ID: {self._generate_call_id()}",
-            f"CSeq: {self.cseq_counter} MESSAGE",
-            f"Contact: <sip:{self.sip_config['login']}@{self._get_local_ip()}:5060;transport=udp>",
-            "User-Agent: SIPGateway/1.0",
-            "Content-Type: text/plain"
-        ]
+        local_ip = self._get_local_ip()
+        
+        msg = _REQUEST_HEAD_TMPL % (
+            "MESSAGE", target, local_ip, self._generate_branch(),
+            self.sip_config['number'], server, self._generate_tag(),
+            f"{to_number}@{server}", self._generate_call_id(),
+            self.cseq_counter, "MESSAGE")
         
         # Добавление авторизации
         if self.has_cached_auth():
-            auth_header = self._build_generic_auth_header("MESSAGE", target)
-            headers.append(auth_header)
+            msg += self._build_generic_auth_header("MESSAGE", target) + "\r\n"
         
-        headers.extend([
-            f"Content-Length: {len(content)}",
-            "",
-            content
-        ])
-        
-        return "\r\n".join(headers)
+        # Content-Length counts octets, not characters
+        content = content.encode()
+        return b"%b%bContent-Type: text/plain\r\nContent-Length: %d\r\n\r\n%b" % (
+            msg.encode(), self._request_tail, len(content), content)
 
     async def make_call(self, number: str) -> bool:
         """Make outgoing call to specified number with authentication"""
@@ -370,9 +639,9 @@ class SIPClient:
                 return False
             
             self.dialed_number = number
-            self.call_state = "DIALING"
+            self.call_state = CallState.DIALING
             
-            self.logger.outgoing_info(f"Совершение вызова на номер: {number}")
+            self.logger.outgoing_info("Совершение вызова на номер: %s", number)
             
             # Generate new call ID and tags for this call
             self.current_call_id = self._generate_call_id()
@@ -383,15 +652,11 @@ class SIPClient:
             invite_msg = self._build_authorized_invite(number)
             
             # Send INVITE
-            server = self.sip_config['sip_server']
-            port = self.sip_config['sip_port']
-            
-            self.logger.outgoing_debug(f"Авторизованный INVITE:\n{invite_msg}")
+            self._log_outgoing_message("Авторизованный INVITE", invite_msg)
             
-            self.sip_socket.sendto(invite_msg.encode(), (server, port))
-            self.messages_sent += 1
+            self._send(invite_msg, self._server_addr)
             
-            self.logger.outgoing_info(f"INVITE на номер {number}")
+            self.logger.outgoing_info("INVITE на номер %s", number)
             
             # Start call timeout
             asyncio.create_task(self._call_timeout_manager())
@@ -406,8 +671,8 @@ class SIPClient:
 
     def _build_sdp_body(self, local_ip: str) -> str:
         """Build SDP body for INVITE"""
-        # Generate random session ID
-        session_id = random.getrandbits(32)
+        # Random session ID from the same urandom pool as tags/branches
+        session_id = int(self._rand_hex(4), 16)
         
         sdp = [
             "v=0",
@@ -429,7 +694,7 @@ class SIPClient:
         """Manage call timeout - if no response in 30 seconds, cancel call"""
         await asyncio.sleep(30)  # 30 seconds timeout
         
-        if self.call_state == "DIALING":
+        if self.call_state == CallState.DIALING:
             self.logger.outgoing_warning("Таймаут вызова - отмена звонка")
             await self.hangup_call()
             if self.websocket_bridge:
@@ -441,16 +706,12 @@ class SIPClient:
             if not self.sip_socket or not self.registered:
                 return False
             
-            server = self.sip_config['sip_server']
-            port = self.sip_config['sip_port']
-            
             # Build authenticated OPTIONS
             options_msg = self._build_authorized_options()
             
-            self.logger.outgoing_debug(f"OPTIONS:\n{options_msg}")
+            self._log_outgoing_message("OPTIONS", options_msg)
             
-            self.sip_socket.sendto(options_msg.encode(), (server, port))
-            self.messages_sent += 1
+            self._send(options_msg, self._server_addr)
             self.logger.outgoing_debug("OPTIONS отправлен")
             return True
             
@@ -464,16 +725,12 @@ class SIPClient:
             if not self.sip_socket or not self.registered:
                 return False
             
-            server = self.sip_config['sip_server']
-            port = self.sip_config['sip_port']
-            
             # Build authenticated OPTIONS
             options_msg = self._build_authorized_options()
             
             self.logger.outgoing_debug("Отправка авторизованного OPTIONS (синхронно)")
             
-            self.sip_socket.sendto(options_msg.encode(), (server, port))
-            self.messages_sent += 1
+            self._send(options_msg, self._server_addr)
             self.logger.outgoing_debug("Авторизованный OPTIONS запрос отправлен (синхронно)")
             return True
             
@@ -485,57 +742,37 @@ class SIPClient:
         """Send initial REGISTER without authentication"""
         try:
             server = self.sip_config['sip_server']
-            port = self.sip_config['sip_port']
             local_ip = self._get_local_ip()
             
             register_msg = self._build_register_message()
             
-            self.logger.outgoing_debug(f"Отправка REGISTER:\n{register_msg}")
+            self._log_outgoing_message("Отправка REGISTER", register_msg)
             
-            self.sip_socket.sendto(register_msg.encode(), (server, port))
-            self.messages_sent += 1
-            self.logger.outgoing_info(f"REGISTER отправлен на {server}:{port}")
+            self._send(register_msg, self._server_addr)
+            self.logger.outgoing_info("REGISTER отправлен на %s:%s", server, self._server_addr[1])
             return True
             
         except Exception as e:
             self.logger.outgoing_error(f"Ошибка отправки REGISTER: {e}")
             return False
     
-    def _build_register_message(self, with_auth=False) -> str:
-        """Build SIP REGISTER message"""
-        server = self.sip_config['sip_server']
-        local_ip = self._get_local_ip()
-        number = self.sip_config['number']
-        login = self.sip_config['login']
-        
+    def _build_register_message(self, with_auth=False, expires: Optional[int] = None) -> bytes:
+        """Build SIP REGISTER message; expires=0 removes the binding"""
         # Generate SIP parameters
-        call_id = self.call_id or f"{random.getrandbits(32)}@{local_ip}"
-        branch = f"z9hG4bK{random.getrandbits(32)}"
-        tag = self.from_tag or f"{random.getrandbits(32)}"
-        
-        headers = [
-            f"REGISTER sip:{server} SIP/2.0",
-            f"Via: SIP/2.0/UDP {local_ip}:5060;branch={branch};rport",
-            "Max-Forwards: 70",
-            f"From: <sip:{number}@{server}>;tag={tag}",
-            f"To: <sip:{number}@{server}>",
-            f"Call-ID: {call_id}",
-            f"CSeq: {self.cseq_counter} REGISTER",
-            f"Contact: <sip:{login}@{local_ip}:5060;transport=udp>;expires={self.register_expires}",
-            "User-Agent: SIPGateway/1.0",
-            f"Expires: {self.register_expires}",
-            "Supported: outbound, path"
-        ]
+        call_id = self.call_id or self._generate_call_id()
+        branch = self._generate_branch()
+        tag = self.from_tag or self._generate_tag()
+        if expires is None:
+            expires = self.register_expires
+        
+        msg = self._register_tmpl % (
+            branch, tag, call_id, self.cseq_counter, expires, expires)
         
         # Add authentication if required
         if with_auth and self.auth_nonce:
-            auth_header = self._build_auth_header()
-            headers.append(auth_header)
-        
-        headers.append("Content-Length: 0")
-        headers.append("")  # Empty line for end of headers
+            msg += self._build_auth_header() + "\r\n"
         
-        return "\r\n".join(headers)
+        return (msg + "Content-Length: 0\r\n").encode()
     
     def _calculate_sip_response(self, nonce, qop=None, nc="00000001", cnonce=None, method="REGISTER", uri=None):
         """Calculate SIP digest auth response for different methods"""
@@ -548,23 +785,56 @@ class SIPClient:
             uri = f"sip:{self.sip_config['sip_server']}"
         
         if cnonce is None:
-            cnonce = ''.join(random.choices(string.ascii_letters + string.digits, k=16))
+            cnonce = self._rand_hex(8)
         
         # HA1 = MD5(username:realm:password)
-        ha1 = hashlib.md5(f"{username}:{realm}:{password}".encode()).hexdigest()
+        ha1 = self._get_ha1(username, realm, password)
         
         # HA2 = MD5(method:uri)
-        ha2 = hashlib.md5(f"{method}:{uri}".encode()).hexdigest()
+        h = _md5(method.encode())
+        h.update(b":")
+        h.update(uri.encode())
+        ha2 = h.hexdigest().encode()
         
+        # Both forms start with "HA1:nonce:" - resume from a primed state
+        h = self._get_response_prefix(ha1, nonce).copy()
         if qop == "auth":
             # Response = MD5(HA1:nonce:nc:cnonce:qop:HA2)
-            response = hashlib.md5(f"{ha1}:{nonce}:{nc}:{cnonce}:{qop}:{ha2}".encode()).hexdigest()
-        else:
-            # Response = MD5(HA1:nonce:HA2)
-            response = hashlib.md5(f"{ha1}:{nonce}:{ha2}".encode()).hexdigest()
+            h.update(nc.encode())
+            h.update(b":")
+            h.update(cnonce.encode())
+            h.update(b":")
+            h.update(qop.encode())
+            h.update(b":")
+        # else Response = MD5(HA1:nonce:HA2)
+        h.update(ha2)
+        response = h.hexdigest()
         
         return response, cnonce
     
+    def _get_ha1(self, username: str, realm: str, password: str) -> bytes:
+        """HA1 as hex bytes, recomputed only when login/realm/password change"""
+        key = (username, realm, password)
+        if self._ha1 is None or self._ha1[0] != key:
+            h = _md5(username.encode())
+            h.update(b":")
+            h.update(str(realm).encode())
+            h.update(b":")
+            h.update(password.encode())
+            self._ha1 = (key, h.hexdigest().encode())
+        return self._ha1[1]
+    
+    def _get_response_prefix(self, ha1: bytes, nonce: str):
+        """MD5 state fed with "HA1:nonce:", kept until the nonce changes"""
+        key = (ha1, nonce)
+        if self._md5_prefix is None or self._md5_prefix[0] != key:
+            h = _md5(ha1)
+            h.update(b":")
+            h.update(nonce.encode())
+            h.update(b":")
+            self._md5_prefix = (key, h)
+        return self._md5_prefix[1]
+    
     def _build_auth_header(self) -> str:
         """Build Authorization header for digest authentication"""
         username = self.sip_config['login']
@@ -580,112 +850,267 @@ class SIPClient:
             uri=uri
         )
         
-        self.logger.outgoing_debug(f"Calculated response: {response}")
+        self.logger.outgoing_debug("Calculated response: %s", response)
         
         # Build Authorization header according to RFC 2617
-        auth_parts = [
-            f'Authorization: Digest username="{username}"',
-            f'realm="{realm}"',
-            f'nonce="{nonce}"',
-            f'uri="{uri}"',
-            f'response="{response}"'
-        ]
+        return self._format_auth_header(username, realm, nonce, uri, response, cnonce)
+    
+    def _format_auth_header(self, username, realm, nonce, uri, response, cnonce) -> str:
+        """Format the Authorization header line (without CRLF)"""
+        header = _AUTH_TMPL % (username, realm, nonce, uri, response)
         
         # Add mandatory parameters for qop=auth
         if self.auth_qop:
-            auth_parts.extend([
-                f'qop={self.auth_qop}',
-                f'nc=00000001',
-                f'cnonce="{cnonce}"'
-            ])
+            header += ', qop=%s, nc=00000001, cnonce="%s"' % (self.auth_qop, cnonce)
         
         if self.auth_opaque:
-            auth_parts.append(f'opaque="{self.auth_opaque}"')
+            header += ', opaque="%s"' % self.auth_opaque
         
         # Always include algorithm
-        auth_parts.append('algorithm=MD5')
-        
-        return ", ".join(auth_parts)
+        return header + ', algorithm=MD5'
     
     def _parse_www_authenticate(self, header: str) -> Dict:
         """Parse WWW-Authenticate header"""
         params = {}
         try:
-            # Extract parameters from header
-            realm_match = re.search(r'realm="([^"]+)"', header)
-            nonce_match = re.search(r'nonce="([^"]+)"', header)
-            opaque_match = re.search(r'opaque="([^"]+)"', header)
-            qop_match = re.search(r'qop="([^"]+)"', header)
-            algorithm_match = re.search(r'algorithm=([^,]+)', header)
-            stale_match = re.search(r'stale=([^,]+)', header)
-            
-            if realm_match:
-                params['realm'] = realm_match.group(1)
-            if nonce_match:
-                params['nonce'] = nonce_match.group(1)
-            if opaque_match:
-                params['opaque'] = opaque_match.group(1)
-            if qop_match:
-                params['qop'] = qop_match.group(1)
-            if algorithm_match:
-                params['algorithm'] = algorithm_match.group(1)
-            if stale_match:
-                params['stale'] = stale_match.group(1).lower() == "true"
+            # Single pass over name=value pairs; quoted values may contain
+            # commas (qop="auth,auth-int"), so they are cut at the closing quote
+            n = len(header)
+            # Skip the "Digest" scheme token
+            sp = header.find(' ')
+            i = sp + 1 if sp >= 0 and '=' not in header[:sp] else 0
+            while i < n:
+                eq = header.find('=', i)
+                if eq < 0:
+                    break
+                name = header[i:eq].strip(' ,\t')
+                if eq + 1 < n and header[eq + 1] == '"':
+                    end = header.find('"', eq + 2)
+                    if end < 0:
+                        end = n
+                    value, quoted = header[eq + 2:end], True
+                    i = end + 1
+                else:
+                    end = header.find(',', eq + 1)
+                    if end < 0:
+                        end = n
+                    value, quoted = header[eq + 1:end].strip(), False
+                    i = end
+                i += 1
+                
+                if (name not in _AUTH_PARAMS or name in params or not value
+                        or (not quoted and name in _AUTH_QUOTED_PARAMS)):
+                    continue
+                params[name] = value.lower() == "true" if name == 'stale' else value
                 
         except Exception as e:
             self.logger.incoming_error(f"Ошибка парсинга WWW-Authenticate: {e}")
         
         return params
     
-    def _receiving_loop(self):
-        """Receive SIP messages and put them in queue"""
-        while self.running:
-            try:
-                if self.sip_socket:
-                    # Check for incoming data
-                    ready, _, _ = select.select([self.sip_socket], [], [], 0.5)
-                    if ready:
-                        data, addr = self.sip_socket.recvfrom(4096)
-                        message = data.decode('utf-8', errors='ignore')
-                        
-                        # Log detailed message info
-                        self._log_incoming_message(message, addr)
-                        
-                        # Put message in queue for processing
-                        self.message_queue.put(('message', message, addr))
-                        self.messages_received += 1
+    def _tune_socket(self, sock: socket.socket):
+        """Enlarge kernel buffers and allow port sharing between workers"""
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SIP_SOCKET_BUFFER)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SIP_SOCKET_BUFFER)
+            if hasattr(socket, 'SO_REUSEPORT'):
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            if self.udp_no_checksum and sys.platform.startswith('linux'):
+                sock.setsockopt(socket.SOL_SOCKET, SO_NO_CHECK, 1)
+                self.logger.outgoing_info("UDP контрольные суммы отключены (SO_NO_CHECK)")
+        except OSError as e:
+            self.logger.outgoing_warning(f"Не удалось настроить буферы SIP сокета: {e}")
+            return
+        
+        # Linux doubles the requested value and caps it at rmem_max/wmem_max
+        rcvbuf = sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+        sndbuf = sock.getsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF)
+        self.logger.outgoing_debug("Буферы SIP сокета: SO_RCVBUF=%s, SO_SNDBUF=%s", rcvbuf, sndbuf)
+        if rcvbuf < SIP_SOCKET_BUFFER:
+            self.logger.outgoing_warning(
+                f"SO_RCVBUF ограничен ядром ({rcvbuf} < {SIP_SOCKET_BUFFER}), "
+                f"увеличьте net.core.rmem_max")
+    
+    def _io_loop(self):
+        """Receive, handle and send SIP datagrams on one selectors loop"""
+        self._io_ident = get_ident()
+        sock = self.sip_socket
+        sel = selectors.DefaultSelector()
+        sel.register(sock, selectors.EVENT_READ, 'sip')
+        sel.register(self._wakeup_r, selectors.EVENT_READ, 'wakeup')
+        want_write = False
+        try:
+            while self.running:
+                try:
+                    for key, mask in sel.select():
+                        if key.data == 'wakeup':
+                            self._drain_wakeup()
+                        elif mask & selectors.EVENT_READ:
+                            self._handle_recv(sock)
+                    
+                    if not self.running:
+                        break
+                    
+                    # Send what the handlers (or other threads) queued; wait
+                    # for EVENT_WRITE only while the socket buffer is full
+                    drained = self._flush_tx_queue()
+                    if drained == want_write:
+                        want_write = not drained
+                        events = selectors.EVENT_READ
+                        if want_write:
+                            events |= selectors.EVENT_WRITE
+                        sel.modify(sock, events, 'sip')
                 
-                time.sleep(0.01)
+                except Exception as e:
+                    if self.running:
+                        self.logger.incoming_error(f"Ошибка в I/O loop: {e}")
+        finally:
+            sel.close()
+            with self._io_lock:
+                self._io_ident = None
+                # disconnect() gave up waiting and left the socket to us
+                if self.sip_socket is not sock:
+                    sock.close()
+    
+    def _handle_recv(self, sock: socket.socket) -> None:
+        """Drain the socket and handle every queued datagram"""
+        while True:
+            if self._rx_bufs:
+                # Everything queued on the socket in one syscall
+                datagrams = self._rx_bufs.recv(sock, socket.MSG_DONTWAIT)
+            else:
+                # No recvmmsg: recv into one reusable buffer until EAGAIN
+                datagrams = []
+                buf, view = self._rx_buf, self._rx_view
+                try:
+                    while len(datagrams) < BATCH_SIZE:
+                        nbytes, addr = sock.recvfrom_into(buf)
+                        # Slicing the view copies once; buf[:n] would copy twice
+                        datagrams.append((bytes(view[:nbytes]), addr))
+                except BlockingIOError:
+                    pass
+            if not datagrams:
+                return
+            self.messages_received += len(datagrams)
+            
+            for data, addr in datagrams:
+                if not data:
+                    continue
                 
-            except socket.timeout:
-                continue
-            except Exception as e:
-                if self.running:
-                    self.logger.incoming_error(f"Ошибка в receiving loop: {e}")
+                # Both log and report their own errors
+                self._log_incoming_message(data, addr)
+                self._handle_sip_message(data, addr)
+            
+            if len(datagrams) < BATCH_SIZE:
+                return
     
-    def _log_incoming_message(self, message: str, addr: tuple):
+    def _drain_wakeup(self):
+        try:
+            while self._wakeup_r.recv(4096):
+                pass
+        except OSError:  # includes BlockingIOError - nothing left to read
+            pass
+    
+    def _wake_io(self):
+        """Wake the I/O thread from another thread"""
+        try:
+            self._wakeup_w.send(b'\0')
+        except (OSError, AttributeError):
+            # Pipe already full (a wakeup is pending) or not created yet
+            pass
+    
+    def _send(self, payload: bytes, addr: tuple):
+        """Queue a datagram for the I/O thread"""
+        self._tx_queue.append((payload, addr))
+        # Handlers on the I/O thread itself are flushed after each select
+        if get_ident() != self._io_ident:
+            self._wake_io()
+    
+    def _flush_tx_queue(self) -> bool:
+        """Send everything currently queued.
+        
+        Sends never block: on a full socket buffer the unsent tail goes back
+        to the front of the queue and False is returned.
+        """
+        total = 0
+        try:
+            while self._tx_queue:
+                batch = []
+                while self._tx_queue and len(batch) < BATCH_SIZE:
+                    batch.append(self._tx_queue.popleft())
+                
+                sent = 0
+                if self._tx_bufs and len(batch) > 1:
+                    try:
+                        sent = self._tx_bufs.send(self.sip_socket, batch, socket.MSG_DONTWAIT)
+                    except BlockingIOError:
+                        self._requeue(batch)
+                        return False
+                    except OSError as e:
+                        # e.g. a hostname instead of an IPv4 literal - send one by one
+                        self.logger.outgoing_debug("sendmmsg недоступен для пакета: %s", e)
+                
+                for i in range(sent, len(batch)):
+                    payload, addr = batch[i]
+                    try:
+                        self.sip_socket.sendmsg([payload], [], socket.MSG_DONTWAIT, addr)
+                        sent += 1
+                    except BlockingIOError:
+                        total += sent
+                        self._requeue(batch[i:])
+                        return False
+                    except OSError as e:
+                        self.logger.outgoing_error(f"Ошибка отправки SIP сообщения на {addr}: {e}")
+                total += sent
+            return True
+        finally:
+            # One counter update per flush rather than per datagram/batch
+            if total:
+                self.messages_sent += total
+    
+    def _requeue(self, datagrams: list):
+        """Put unsent datagrams back at the head of the send queue"""
+        self._tx_queue.extendleft(reversed(datagrams))
+    
+    def _log_outgoing_message(self, title: str, payload: bytes):
+        """Dump an outgoing SIP message; decoded only when debug is enabled"""
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.outgoing_debug(f"{title}:\n{payload.decode('utf-8', errors='replace')}")
+    
+    def _log_incoming_message(self, data: bytes, addr: tuple):
         """Log detailed information about incoming SIP message"""
+        # Everything below is debug output - skip decoding and parsing otherwise
+        if not self.logger.isEnabledFor(logging.DEBUG):
+            return
         try:
-            lines = message.split('\r\n')
+            message = data.decode('utf-8', errors='ignore')
+            # Only the header block is scanned - the body (SDP) is skipped,
+            # and the split is capped so a bloated datagram cannot blow up logging
+            head = message.partition('\r\n\r\n')[0]
+            lines = head.split('\r\n', 64)
             if not lines:
                 return
                 
             first_line = lines[0]
             
+            # One pass over the headers; the first occurrence wins
+            headers = {}
+            for line in lines[1:]:
+                name, _, value = line.partition(':')
+                headers.setdefault(name, value.lstrip())
+            
+            via_header = headers.get('Via', 'N/A')
+            from_header = headers.get('From', 'N/A')
+            to_header = headers.get('To', 'N/A')
+            call_id_header = headers.get('Call-ID', 'N/A')
+            cseq_header = headers.get('CSeq', 'N/A')
+            
             # Determine message type
             if first_line.startswith('SIP/2.0'):
-                # This is a response
-                status_parts = first_line.split(' ')
-                if len(status_parts) >= 3:
-                    status_code = status_parts[1]
-                    status_text = ' '.join(status_parts[2:])
-                    
-                    # Extract additional headers for debugging
-                    via_header = next((line for line in lines if line.startswith('Via:')), 'N/A')
-                    from_header = next((line for line in lines if line.startswith('From:')), 'N/A')
-                    to_header = next((line for line in lines if line.startswith('To:')), 'N/A')
-                    call_id_header = next((line for line in lines if line.startswith('Call-ID:')), 'N/A')
-                    cseq_header = next((line for line in lines if line.startswith('CSeq:')), 'N/A')
+                # This is a response: "SIP/2.0 NNN Reason", sliced at fixed offsets
+                if len(first_line) >= 11:
+                    status_code = first_line[8:11]
+                    status_text = first_line[12:]
                     
                     self.logger.incoming_debug(f"ОТВЕТ от {addr}")
                     self.logger.incoming_debug(f"Status: {status_code} {status_text}")
@@ -697,13 +1122,10 @@ class SIPClient:
                     
                     # Log specific headers for different response types
                     if status_code == "401":
-                        www_auth = next((line for line in lines if line.startswith('WWW-Authenticate:')), 'N/A')
-                        self.logger.incoming_debug(f"   WWW-Authenticate: {www_auth}")
+                        self.logger.incoming_debug(f"   WWW-Authenticate: {headers.get('WWW-Authenticate', 'N/A')}")
                     elif status_code == "200":
-                        contact_header = next((line for line in lines if line.startswith('Contact:')), 'N/A')
-                        expires_header = next((line for line in lines if line.startswith('Expires:')), 'N/A')
-                        self.logger.incoming_debug(f"   Contact: {contact_header}")
-                        self.logger.incoming_debug(f"   Expires: {expires_header}")
+                        self.logger.incoming_debug(f"   Contact: {headers.get('Contact', 'N/A')}")
+                        self.logger.incoming_debug(f"   Expires: {headers.get('Expires', 'N/A')}")
                     
             else:
                 # This is a request
@@ -711,14 +1133,6 @@ class SIPClient:
                 if len(request_parts) >= 2:
                     method = request_parts[0]
                     
-                    # Extract headers for debugging
-                    via_header = next((line for line in lines if line.startswith('Via:')), 'N/A')
-                    from_header = next((line for line in lines if line.startswith('From:')), 'N/A')
-                    to_header = next((line for line in lines if line.startswith('To:')), 'N/A')
-                    call_id_header = next((line for line in lines if line.startswith('Call-ID:')), 'N/A')
-                    cseq_header = next((line for line in lines if line.startswith('CSeq:')), 'N/A')
-                    contact_header = next((line for line in lines if line.startswith('Contact:')), 'N/A')
-                    
                     self.logger.incoming_debug(f"ЗАПРОС от {addr}")
                     self.logger.incoming_debug(f"Method: {method}")
                     self.logger.incoming_debug(f"Via: {via_header}")
@@ -729,141 +1143,96 @@ class SIPClient:
                     
                     if method == "INVITE":
                         # Log additional INVITE details
-                        content_type = next((line for line in lines if line.startswith('Content-Type:')), 'N/A')
-                        self.logger.incoming_debug(f"   Content-Type: {content_type}")
+                        self.logger.incoming_debug(f"   Content-Type: {headers.get('Content-Type', 'N/A')}")
                     
-                    # Log full message in debug mode for complex requests
-                    if self.logger.isEnabledFor(logging.DEBUG) and method in ["INVITE", "OPTIONS"]:
+                    # Log full message for complex requests
+                    if method in ["INVITE", "OPTIONS"]:
                         self.logger.incoming_debug("   Полное сообщение:")
-                        for line in lines[:20]:  # Log first 20 lines to avoid too much output
+                        # First 20 lines only, found with find() - the tail of a
+                        # large body is never copied
+                        start = 0
+                        for _ in range(20):
+                            end = message.find('\r\n', start)
+                            line = message[start:end] if end >= 0 else message[start:]
                             if line.strip():
                                 self.logger.incoming_debug(f"      {line}")
+                            if end < 0:
+                                break
+                            start = end + 2
                         
         except Exception as e:
             self.logger.incoming_error(f"Ошибка логирования входящего сообщения: {e}")
     
-    def _processing_loop(self):
-        """Process messages from queue in main thread context"""
-        while self.running:
-            try:
-                # Process all available messages
-                while not self.message_queue.empty():
-                    msg_type, data, addr = self.message_queue.get_nowait()
-                    
-                    if msg_type == 'message':
-                        self._handle_sip_message(data, addr)
-                
-                time.sleep(0.01)
-                
-            except Exception as e:
-                if self.running:
-                    self.logger.incoming_error(f"Ошибка в processing loop: {e}")
-    
-    def _handle_sip_message(self, message: str, addr: tuple):
-        """Handle incoming SIP message"""
+    def _handle_sip_message(self, data: bytes, addr: Tuple[str, int]) -> None:
+        """Handle incoming SIP message (raw datagram)"""
         try:
-            self.logger.incoming_debug(f"Обработка сообщения от {addr}")
-        
-            # Parse first line to determine message type
-            lines = message.split('\r\n')
-            first_line = lines[0] if lines else ""
+            self.logger.incoming_debug("Обработка сообщения от %s", addr)
+        
+            # Dispatch on the first token of the start line, still as bytes;
+            # the datagram is decoded only for a handler that needs the text
+            sp = data.find(b' ')
+            eol = data.find(b'\r\n')
+            verb = data[:sp] if sp > 0 and (eol < 0 or sp < eol) else b''
+        
+            if verb == b'SIP/2.0':
+                # This is a response; the code sits at a fixed offset
+                # ("SIP/2.0 NNN ...") - a short datagram yields b'' and
+                # falls through to the debug branch
+                status_code = data[8:11]
+                handler = self._resp_dispatch.get(status_code)
+                if handler:
+                    handler(data.decode('utf-8', errors='ignore'))
+                elif status_code in _RESPONSE_WARNINGS:
+                    self.logger.incoming_warning("Получен %s", _RESPONSE_WARNINGS[status_code])
+                else:
+                    self.logger.incoming_debug("Получен ответ: %s", status_code.decode('ascii', 'replace'))
         
-            if first_line.startswith('SIP/2.0'):
-                # This is a response
-                status_parts = first_line.split(' ')
-                if len(status_parts) >= 2:
-                    status_code = status_parts[1]
-                    if status_code == "401":
-                        self._handle_401_response(message)
-                    elif status_code == "407":
-                        self._handle_407_response(message)
-                    elif status_code == "200":
-                        self._handle_200_response(message)
-                    elif status_code == "100":
-                        self._handle_100_response(message)
-                    elif status_code == "180":
-                        self._handle_180_response(message)
-                    elif status_code == "183":
-                        self._handle_183_response(message)
-                    elif status_code == "486":
-                        self._handle_486_response(message)
-                    elif status_code == "487":
-                        self._handle_487_response(message)
-                    elif status_code == "403":
-                        self.logger.incoming_warning("Получен 403 Forbidden")
-                    elif status_code == "404":
-                        self.logger.incoming_warning("Получен 404 Not Found")
-                    elif status_code == "480":
-                        self.logger.incoming_warning("Получен 480 Temporarily Unavailable")
-                    elif status_code == "603":
-                        self._handle_603_response(message)
-                    else:
-                        self.logger.incoming_debug(f"Получен ответ: {status_code}")
-        
-            elif first_line.startswith('OPTIONS '):
-                self._handle_options_request(message, addr)
-            elif first_line.startswith('INVITE '):
-                self._handle_invite_request(message)
-            elif first_line.startswith('BYE '):
-                self._handle_bye_request(message)
-            elif first_line.startswith('CANCEL '):
-                self._handle_cancel_request(message)
-            elif first_line.startswith('MESSAGE '):
-                self._handle_message_request(message, addr)
-            elif first_line.startswith('NOTIFY '):
-                self._handle_notify_request(message, addr)
-            elif first_line.startswith('SUBSCRIBE '):
-                self._handle_subscribe_request(message, addr)
             else:
-                self.logger.incoming_debug(f"Необработанный тип сообщения: {first_line.split()[0] if first_line.split() else 'UNKNOWN'}")
+                # This is a request
+                handler = self._req_dispatch.get(verb)
+                if handler:
+                    handler(data, addr)
+                elif self.logger.isEnabledFor(logging.DEBUG):
+                    self.logger.incoming_debug("Необработанный тип сообщения: %s", verb.decode('ascii', 'replace') or 'UNKNOWN')
                 
         except Exception as e:
             self.logger.incoming_error(f"Ошибка обработки SIP сообщения: {e}")
 
     def _handle_100_response(self, message: str):
         """Handle 100 Trying response"""
-        if self.call_state == "DIALING":
+        if self.call_state == CallState.DIALING:
             self.logger.incoming_info("Получен 100 Trying - вызов обрабатывается")
     
     def _handle_180_response(self, message: str):
         """Handle 180 Ringing response"""
-        if self.call_state == "DIALING":
-            self.call_state = "RINGING"
+        if self.call_state == CallState.DIALING:
+            self.call_state = CallState.RINGING
             self.logger.incoming_info("180 Ringing - абонент звонит")
             
             # Notify WebSocket about ringing
-            if self.websocket_bridge and self.main_event_loop:
-                asyncio.run_coroutine_threadsafe(
-                    self.websocket_bridge.notify_call_ringing(),
-                    self.main_event_loop
-                )
+            if self.websocket_bridge:
+                self.websocket_bridge.post_event('call_ringing')
     
     def _handle_183_response(self, message: str):
         """Handle 183 Session Progress response"""
-        if self.call_state == "DIALING":
-            self.call_state = "RINGING"
+        if self.call_state == CallState.DIALING:
+            self.call_state = CallState.RINGING
             self.logger.incoming_info("183 Session Progress - вызов прогрессирует")
     
     def _handle_486_response(self, message: str):
         """Handle 486 Busy Here response"""
         self.logger.incoming_warning("Получен 486 Busy Here - абонент занят")
-        if self.call_state in ["DIALING", "RINGING"]:
-            if self.websocket_bridge and self.main_event_loop:
-                asyncio.run_coroutine_threadsafe(
-                    self.websocket_bridge.notify_call_failed("Абонент занят"),
-                    self.main_event_loop
-                )
+        if self.call_state in _RING_STATES:
+            if self.websocket_bridge:
+                self.websocket_bridge.post_event('call_failed', "Абонент занят")
             self._reset_call_state()
 
     def _handle_603_response(self, message: str):
         """Handle 603 Decline response"""
         self.logger.incoming_warning("Получен 603 Decline - абонент отклонил вызов")
-        if self.call_state in ["DIALING", "RINGING"]:
-            if self.websocket_bridge and self.main_event_loop:
-                asyncio.run_coroutine_threadsafe(
-                    self.websocket_bridge.notify_call_failed("Абонент отклонил вызов"),
-                    self.main_event_loop
-                )
+        if self.call_state in _RING_STATES:
+            if self.websocket_bridge:
+                self.websocket_bridge.post_event('call_failed', "Абонент отклонил вызов")
             self._reset_call_state()
     
     def _handle_487_response(self, message: str):
@@ -876,12 +1245,12 @@ class SIPClient:
         self.logger.incoming_info("401 Unauthorized - требуется аутентификация")
         
         # Parse WWW-Authenticate header
-        auth_match = re.search(r'WWW-Authenticate:\s*(Digest[^\r\n]+)', message)
+        auth_match = _RE_WWW_AUTH.search(message)
         if auth_match:
             auth_header = auth_match.group(1)
             auth_params = self._parse_www_authenticate(auth_header)
             
-            self.logger.incoming_debug(f"Параметры аутентификации: {auth_params}")
+            self.logger.incoming_debug("Параметры аутентификации: %s", auth_params)
             
             # Store auth parameters and save to cache
             self.auth_realm = auth_params.get('realm')
@@ -893,10 +1262,10 @@ class SIPClient:
             self.save_auth_cache()
             
             # Определяем метод из CSeq заголовка
-            cseq_match = re.search(r'CSeq:\s*\d+\s+(\w+)', message)
+            cseq_match = _RE_CSEQ_METHOD.search(message)
             if cseq_match:
                 method = cseq_match.group(1)
-                self.logger.outgoing_info(f"Повторная отправка {method} с аутентификацией")
+                self.logger.outgoing_info("Повторная отправка %s с аутентификацией", method)
                 
                 # Повторная отправка с аутентификацией в зависимости от метода
                 if method == "INVITE":
@@ -922,12 +1291,12 @@ class SIPClient:
         self.logger.incoming_info("Получен 407 Proxy Authentication Required - требуется proxy аутентификация")
         
         # Parse Proxy-Authenticate header
-        auth_match = re.search(r'Proxy-Authenticate:\s*(Digest[^\r\n]+)', message)
+        auth_match = _RE_PROXY_AUTH.search(message)
         if auth_match:
             auth_header = auth_match.group(1)
             auth_params = self._parse_www_authenticate(auth_header)
             
-            self.logger.incoming_info(f"Параметры proxy аутентификации: {auth_params}")
+            self.logger.incoming_info("Параметры proxy аутентификации: %s", auth_params)
             
             # Store auth parameters and save to cache
             self.auth_realm = auth_params.get('realm')
@@ -939,53 +1308,42 @@ class SIPClient:
             self.save_auth_cache()
             
             # Определяем метод из CSeq заголовка
-            cseq_match = re.search(r'CSeq:\s*\d+\s+(\w+)', message)
+            cseq_match = _RE_CSEQ_METHOD.search(message)
             if cseq_match:
                 method = cseq_match.group(1)
-                self.logger.outgoing_info(f"Повторная отправка {method} с proxy аутентификацией")
+                self.logger.outgoing_info("Повторная отправка %s с proxy аутентификацией", method)
                 
                 if method == "INVITE":
                     self.cseq_counter += 1
                     self._resend_invite_with_auth()
                 else:
-                    self.logger.outgoing_warning(f"Повторная отправка {method} с proxy auth не реализована")
+                    self.logger.outgoing_warning("Повторная отправка %s с proxy auth не реализована", method)
         else:
             self.logger.incoming_error("Proxy-Authenticate header не найден в 407 ответе")
 
     def _resend_invite_with_auth(self):
         """Resend INVITE with authentication headers"""
         try:
-            server = self.sip_config['sip_server']
-            port = self.sip_config['sip_port']
-            
             invite_msg = self._build_authorized_invite(self.dialed_number)
             
-            self.logger.outgoing_debug(f"Повторная отправка INVITE с аутентификацией:\n{invite_msg}")
+            self._log_outgoing_message("Повторная отправка INVITE с аутентификацией", invite_msg)
             
-            self.sip_socket.sendto(invite_msg.encode(), (server, port))
-            self.messages_sent += 1
+            self._send(invite_msg, self._server_addr)
             self.logger.outgoing_info("INVITE с аутентификацией отправлен")
             
         except Exception as e:
             self.logger.outgoing_error(f"Ошибка повторной отправки INVITE: {e}")
-            if self.websocket_bridge and self.main_event_loop:
-                asyncio.run_coroutine_threadsafe(
-                    self.websocket_bridge.notify_call_failed(f"Ошибка аутентификации: {e}"),
-                    self.main_event_loop
-                )
+            if self.websocket_bridge:
+                self.websocket_bridge.post_event('call_failed', f"Ошибка аутентификации: {e}")
     
     def _send_register_sync(self, with_auth: bool):
         """Send REGISTER synchronously (from processing thread)"""
         try:
-            server = self.sip_config['sip_server']
-            port = self.sip_config['sip_port']
-            
             register_msg = self._build_register_message(with_auth=with_auth)
             
-            self.logger.outgoing_debug(f"REGISTER:\n{register_msg}")
+            self._log_outgoing_message("REGISTER", register_msg)
             
-            self.sip_socket.sendto(register_msg.encode(), (server, port))
-            self.messages_sent += 1
+            self._send(register_msg, self._server_addr)
             
             if with_auth:
                 self.logger.outgoing_info("Аутентифицированный REGISTER")
@@ -997,14 +1355,25 @@ class SIPClient:
     
     def _handle_200_response(self, message: str):
         """Handle 200 OK response"""
-        # Check if this is a response to OPTIONS
-        if "OPTIONS" in message:
+        # Route on the CSeq method rather than a substring scan of the
+        # whole message (Allow: lists both OPTIONS and INVITE, SDP may too)
+        cseq_match = _RE_CSEQ_METHOD.search(message)
+        method = cseq_match.group(1) if cseq_match else "REGISTER"
+        
+        if method == "OPTIONS":
             self._handle_options_response(message)
             return
             
-        # Check if this is a response to INVITE (call established)
-        if "INVITE" in message and self.call_state in ["DIALING", "RINGING"]:
-            self._handle_invite_200_response(message)
+        # Response to INVITE (call established)
+        if method == "INVITE":
+            if self.call_state in _RING_STATES:
+                self._handle_invite_200_response(message)
+            else:
+                self.logger.incoming_debug("200 OK на INVITE вне набора номера - пропущен")
+            return
+        
+        if method != "REGISTER":
+            self.logger.incoming_debug("200 OK на %s", method)
             return
             
         # Handle REGISTER 200 OK
@@ -1013,26 +1382,23 @@ class SIPClient:
         self.logger.incoming_info("200 OK - успешная регистрация")
         
         # Extract expiration time
-        expires_match = re.search(r'Expires:\s*(\d+)', message)
+        expires_match = _RE_EXPIRES.search(message)
         if expires_match:
             self.register_expires = int(expires_match.group(1))
-            self.logger.incoming_debug(f"Время жизни регистрации: {self.register_expires} секунд")
+            self.logger.incoming_debug("Время жизни регистрации: %s секунд", self.register_expires)
         
         # Schedule WebSocket notification in main thread
-        if self.websocket_bridge and self.main_event_loop:
-            asyncio.run_coroutine_threadsafe(
-                self.websocket_bridge.notify_sip_registered(),
-                self.main_event_loop
-            )
+        if self.websocket_bridge:
+            self.websocket_bridge.post_event('sip_registered')
     
     def _handle_invite_200_response(self, message: str):
         """Handle 200 OK response to INVITE (call answered)"""
-        self.call_state = "ACTIVE"
+        self.call_state = CallState.ACTIVE
         self.active_call = True
         self.logger.incoming_info("200 OK - звонок установлен")
         
         # Extract To tag
-        to_match = re.search(r'To:[^;]*;tag=([^\s\r\n]+)', message)
+        to_match = _RE_TO_TAG.search(message)
         if to_match:
             self.to_tag = to_match.group(1)
         
@@ -1040,207 +1406,115 @@ class SIPClient:
         self._send_ack_sync()
         
         # Notify WebSocket about call answered
-        if self.websocket_bridge and self.main_event_loop:
-            asyncio.run_coroutine_threadsafe(
-                self.websocket_bridge.notify_call_answered(),
-                self.main_event_loop
-            )
+        if self.websocket_bridge:
+            self.websocket_bridge.post_event('call_answered')
     
     def _send_ack_sync(self):
         """Send ACK for established call"""
         try:
-            server = self.sip_config['sip_server']
-            port = self.sip_config['sip_port']
-            local_ip = self._get_local_ip()
-            login = self.sip_config['login']
-            
-            ack_msg = [
-                f"ACK sip:{self.dialed_number}@{server} SIP/2.0",
-                f"Via: SIP/2.0/UDP {local_ip}:5060;branch=z9hG4bK{random.getrandbits(32)};rport",
-                "Max-Forwards: 70",
-                f"From: <sip:{self.sip_config['number']}@{server}>;tag={self.from_tag}",
-                f"To: <sip:{self.dialed_number}@{server}>;tag={self.to_tag}",
-                f"Call-ID: {self.current_call_id}",
-                f"CSeq: {self.cseq_counter} ACK",
-                f"Contact: <sip:{login}@{local_ip}:5060;transport=udp>",
-                "User-Agent: SIPGateway/1.0",
-                "Content-Length: 0",
-                "",
-                ""
-            ]
-            
-            ack_msg_str = "\r\n".join(ack_msg)
-            self.sip_socket.sendto(ack_msg_str.encode(), (server, port))
-            self.messages_sent += 1
+            server = self._server_bytes
+            dialed = self.dialed_number.encode()
+            
+            ack_msg = _ACK_TMPL % (
+                dialed, server, self._via_prefix, self._generate_branch().encode(),
+                self._number_bytes, server, str(self.from_tag).encode(),
+                dialed, server, str(self.to_tag).encode(),
+                str(self.current_call_id).encode(), self.cseq_counter,
+                self._login_bytes, self._local_ip_bytes)
+            self._send(ack_msg, self._server_addr)
             self.logger.outgoing_debug("ACK отправлен")
             
         except Exception as e:
             self.logger.outgoing_error(f"Ошибка отправки ACK: {e}")
     
+    @staticmethod
+    def _collect_headers(message: AnyStr, wanted: Collection[AnyStr]) -> Dict[AnyStr, AnyStr]:
+        """Full header lines for the wanted names, in one pass over the head.
+        
+        Works on str or on the raw datagram (bytes); names in wanted must be
+        of the same type. The first occurrence wins; the body after the blank
+        line is not scanned. Lines are located with find and only wanted ones
+        are sliced out, so the scan stops as soon as every wanted header has
+        been seen.
+        """
+        crlf, colon_ch = (b'\r\n', b':') if isinstance(message, bytes) else ('\r\n', ':')
+        out = {}
+        end = message.find(crlf + crlf)
+        if end < 0:
+            end = len(message)
+        pos = message.find(crlf, 0, end)  # skip the start line
+        while 0 <= pos < end and len(out) < len(wanted):
+            start = pos + 2
+            eol = message.find(crlf, start, end)
+            if eol < 0:
+                eol = end
+            colon = message.find(colon_ch, start, eol)
+            if colon > 0:
+                name = message[start:colon]
+                if name in wanted and name not in out:
+                    out[name] = message[start:eol]
+            pos = eol
+        return out
+    
     def _handle_options_response(self, message: str):
         """Handle 200 OK response to OPTIONS request"""
         self.last_options_response = time.time()
         self.logger.incoming_debug("Получен 200 OK на OPTIONS запрос - сервер доступен")
         
         # Extract server capabilities if available
-        lines = message.split('\r\n')
-        allow_header = next((line for line in lines if line.startswith('Allow:')), '')
-        supported_header = next((line for line in lines if line.startswith('Supported:')), '')
+        hdrs = self._collect_headers(message, ('Allow', 'Supported'))
+        allow_header = hdrs.get('Allow', '')
+        supported_header = hdrs.get('Supported', '')
         
         if allow_header:
-            self.logger.incoming_debug(f"   Сервер поддерживает: {allow_header}")
+            self.logger.incoming_debug("   Сервер поддерживает: %s", allow_header)
         if supported_header:
-            self.logger.incoming_debug(f"   Расширения сервера: {supported_header}")
+            self.logger.incoming_debug("   Расширения сервера: %s", supported_header)
     
-    def _handle_options_request(self, message: str, addr: tuple):
+    def _handle_options_request(self, data: bytes, addr: tuple):
         """Handle OPTIONS request (keep-alive from server)"""
         try:
             self.logger.incoming_debug("Получен OPTIONS запрос (keep-alive от сервера)")
             
             # Parse headers from OPTIONS request
-            lines = message.split('\r\n')
-            via_header = next((line for line in lines if line.startswith('Via:')), '')
-            from_header = next((line for line in lines if line.startswith('From:')), '')
-            to_header = next((line for line in lines if line.startswith('To:')), '')
-            call_id_header = next((line for line in lines if line.startswith('Call-ID:')), '')
-            cseq_header = next((line for line in lines if line.startswith('CSeq:')), '')
+            hdrs = self._collect_headers(data, _ECHO_HEADERS)
+            via_header = hdrs.get(b'Via', b'')
+            from_header = hdrs.get(b'From', b'')
+            to_header = hdrs.get(b'To', b'')
+            call_id_header = hdrs.get(b'Call-ID', b'')
+            cseq_header = hdrs.get(b'CSeq', b'')
             
-            # Extract from tag
-            from_tag_match = re.search(r'tag=([^\s;]+)', from_header)
-            from_tag = from_tag_match.group(1) if from_tag_match else ""
+            # No From tag: tag our To instead
+            if not _RE_TAG.search(from_header):
+                to_header += b";tag=" + self._generate_tag().encode()
             
             # Build 200 OK response
-            local_ip = self._get_local_ip()
-            response = [
-                "SIP/2.0 200 OK",
-                via_header,
-                from_header,
-                to_header + (f";tag={self._generate_tag()}" if not from_tag else ""),
-                call_id_header,
-                cseq_header,
-                f"Contact: <sip:{self.sip_config['login']}@{local_ip}:5060;transport=udp>",
-                "User-Agent: SIPGateway/1.0",
-                "Allow: INVITE, ACK, CANCEL, OPTIONS, BYE, REFER, SUBSCRIBE, NOTIFY, MESSAGE, INFO",
-                "Supported: replaces, timer, outbound, path, gruu",
-                "Accept: application/sdp, application/dtmf-relay",
-                "Accept-Encoding: identity",
-                "Accept-Language: en, ru",
-                "Content-Length: 0",
-                "",
-                ""
-            ]
-            
-            response_msg = "\r\n".join(response)
+            response_msg = _OPTIONS_OK_TMPL % (
+                via_header, from_header, to_header, call_id_header, cseq_header,
+                self._login_bytes, self._local_ip_bytes)
             
             # Send response
-            self.sip_socket.sendto(response_msg.encode(), addr)
-            self.messages_sent += 1
+            self._send(response_msg, addr)
             self.logger.outgoing_debug("Отправлен 200 OK на OPTIONS запрос от сервера")
             
         except Exception as e:
             self.logger.outgoing_error(f"Ошибка обработки OPTIONS: {e}")
     
-    def _handle_message_request(self, message: str, addr: tuple):
-        """Handle MESSAGE request"""
-        try:
-            self.logger.incoming_debug("Получен MESSAGE запрос")
-            
-            # Parse headers
-            lines = message.split('\r\n')
-            via_header = next((line for line in lines if line.startswith('Via:')), '')
-            from_header = next((line for line in lines if line.startswith('From:')), '')
-            to_header = next((line for line in lines if line.startswith('To:')), '')
-            call_id_header = next((line for line in lines if line.startswith('Call-ID:')), '')
-            cseq_header = next((line for line in lines if line.startswith('CSeq:')), '')
-            
-            # Send 200 OK response
-            response = [
-                "SIP/2.0 200 OK",
-                via_header,
-                from_header,
-                to_header,
-                call_id_header,
-                cseq_header,
-                "Content-Length: 0",
-                "",
-                ""
-            ]
-            
-            response_msg = "\r\n".join(response)
-            self.sip_socket.sendto(response_msg.encode(), addr)
-            self.messages_sent += 1
-            self.logger.outgoing_debug("Отправлен 200 OK на MESSAGE запрос")
-            
-        except Exception as e:
-            self.logger.outgoing_error(f"Ошибка обработки MESSAGE: {e}")
-    
-    def _handle_notify_request(self, message: str, addr: tuple):
-        """Handle NOTIFY request"""
+    def _reply_200_ok_echo(self, data: bytes, addr: tuple, kind: str):
+        """Answer MESSAGE/NOTIFY/SUBSCRIBE with a 200 OK echoing the dialog headers"""
         try:
-            self.logger.incoming_debug("Получен NOTIFY запрос")
-            
-            # Send 200 OK response
-            lines = message.split('\r\n')
-            via_header = next((line for line in lines if line.startswith('Via:')), '')
-            from_header = next((line for line in lines if line.startswith('From:')), '')
-            to_header = next((line for line in lines if line.startswith('To:')), '')
-            call_id_header = next((line for line in lines if line.startswith('Call-ID:')), '')
-            cseq_header = next((line for line in lines if line.startswith('CSeq:')), '')
-            
-            response = [
-                "SIP/2.0 200 OK",
-                via_header,
-                from_header,
-                to_header,
-                call_id_header,
-                cseq_header,
-                "Content-Length: 0",
-                "",
-                ""
-            ]
-            
-            response_msg = "\r\n".join(response)
-            self.sip_socket.sendto(response_msg.encode(), addr)
-            self.messages_sent += 1
-            self.logger.outgoing_debug("Отправлен 200 OK на NOTIFY запрос")
+            self.logger.incoming_debug("Получен %s запрос", kind)
             
-        except Exception as e:
-            self.logger.outgoing_error(f"Ошибка обработки NOTIFY: {e}")
-    
-    def _handle_subscribe_request(self, message: str, addr: tuple):
-        """Handle SUBSCRIBE request"""
-        try:
-            self.logger.incoming_debug("Получен SUBSCRIBE запрос")
-            
-            # Send 200 OK response
-            lines = message.split('\r\n')
-            via_header = next((line for line in lines if line.startswith('Via:')), '')
-            from_header = next((line for line in lines if line.startswith('From:')), '')
-            to_header = next((line for line in lines if line.startswith('To:')), '')
-            call_id_header = next((line for line in lines if line.startswith('Call-ID:')), '')
-            cseq_header = next((line for line in lines if line.startswith('CSeq:')), '')
-            
-            response = [
-                "SIP/2.0 200 OK",
-                via_header,
-                from_header,
-                to_header,
-                call_id_header,
-                cseq_header,
-                "Content-Length: 0",
-                "",
-                ""
-            ]
-            
-            response_msg = "\r\n".join(response)
-            self.sip_socket.sendto(response_msg.encode(), addr)
-            self.messages_sent += 1
-            self.logger.outgoing_debug("Отправлен 200 OK на SUBSCRIBE запрос")
+            hdrs = self._collect_headers(data, _ECHO_HEADERS)
+            response_msg = _OK_ECHO_TMPL % (hdrs.get(b'Via', b''), hdrs.get(b'From', b''), hdrs.get(b'To', b''),
+                                            hdrs.get(b'Call-ID', b''), hdrs.get(b'CSeq', b''))
+            self._send(response_msg, addr)
+            self.logger.outgoing_debug("Отправлен 200 OK на %s запрос", kind)
             
         except Exception as e:
-            self.logger.outgoing_error(f"Ошибка обработки SUBSCRIBE: {e}")
+            self.logger.outgoing_error(f"Ошибка обработки {kind}: {e}")
     
-    def _handle_cancel_request(self, message: str):
+    def _handle_cancel_request(self, data: bytes):
         """Handle CANCEL request"""
         self.logger.incoming_info("CANCEL запрос - отмена звонка")
         
@@ -1255,8 +1529,8 @@ class SIPClient:
         """Handle INVITE request"""
         try:
             # Extract caller information
-            from_match = re.search(r'From:[^<]*<sip:([^@]+)@', message)
-            call_id_match = re.search(r'Call-ID:\s*([^\r\n]+)', message)
+            from_match = _RE_FROM_URI.search(message)
+            call_id_match = _RE_CALL_ID.search(message)
             
             if from_match:
                 self.caller_number = from_match.group(1)
@@ -1264,19 +1538,16 @@ class SIPClient:
                 self.current_call_id = call_id_match.group(1).strip()
             
             self.incoming_call = True
-            self.logger.incoming_info(f"Входящий звонок от: {self.caller_number}")
+            self.logger.incoming_info("Входящий звонок от: %s", self.caller_number)
             
             # Schedule WebSocket notification in main thread
-            if self.websocket_bridge and self.main_event_loop:
-                asyncio.run_coroutine_threadsafe(
-                    self.websocket_bridge.notify_incoming_call(self.caller_number),
-                    self.main_event_loop
-                )
+            if self.websocket_bridge:
+                self.websocket_bridge.post_event('incoming_call', self.caller_number)
                 
         except Exception as e:
             self.logger.incoming_error(f"Ошибка обработки INVITE: {e}")
     
-    def _handle_bye_request(self, message: str):
+    def _handle_bye_request(self, data: bytes):
         """Handle BYE request"""
         self.logger.incoming_info("BYE - завершение звонка")
         
@@ -1287,25 +1558,36 @@ class SIPClient:
                 self.main_event_loop
             )
     
-    def _keepalive_loop(self):
+    async def _keepalive_loop(self):
         """Send periodic re-registration and handle keep-alive"""
         while self.running:
             try:
-                # Re-register if needed (every 20 minutes or when expired)
-                if self.registered and time.time() - self.last_register_time > 240:  # 4 minutes
-                    self.logger.outgoing_info("Периодическая перерегистрация")
-                    self.cseq_counter += 1
-                    self._send_register_sync(with_auth=True)
-                    self.last_register_time = time.time()
-                
-                # Send OPTIONS keep-alive if no server OPTIONS received recently
-                if self.registered and time.time() - self.last_options_response > 60:  # 1 minute
-                    # Use synchronous method instead of async in thread
-                    self._send_options_sync()
-                    self.last_options_response = time.time()
+                delay = 10.0  # not registered yet - just poll
+                if self.registered:
+                    now = time.time()
+                    # Re-register when the deadline has passed
+                    if now - self.last_register_time >= REREGISTER_INTERVAL:
+                        self.logger.outgoing_info("Периодическая перерегистрация")
+                        self.cseq_counter += 1
+                        self._send_register_sync(with_auth=True)
+                        self.last_register_time = now
+                    
+                    # Send OPTIONS keep-alive if no server OPTIONS received recently
+                    if now - self.last_options_response >= OPTIONS_INTERVAL:
+                        self._send_options_sync()
+                        self.last_options_response = now
+                    
+                    # Sleep until the nearer deadline instead of a fixed tick; both
+                    # timestamps may move forward meanwhile (server OPTIONS, 200 OK),
+                    # which is simply re-checked on wakeup
+                    delay = min(self.last_register_time + REREGISTER_INTERVAL,
+                                self.last_options_response + OPTIONS_INTERVAL) - now
                 
-                time.sleep(10)  # Check every 10 seconds
+                # Bounded so a wall clock step cannot stall keepalive for long
+                await asyncio.sleep(min(max(delay, 0.5), OPTIONS_INTERVAL))
                 
+            except asyncio.CancelledError:
+                break
             except Exception as e:
                 if self.running:
                     self.logger.outgoing_error(f"Ошибка в keepalive loop: {e}")
@@ -1321,7 +1603,7 @@ class SIPClient:
             self.logger.outgoing_info("Ответ на входящий звонок")
             self.incoming_call = False
             self.active_call = True
-            self.call_state = "ACTIVE"
+            self.call_state = CallState.ACTIVE
             
             if self.websocket_bridge:
                 await self.websocket_bridge.notify_call_answered()
@@ -1335,7 +1617,7 @@ class SIPClient:
     async def hangup_call(self) -> bool:
         """Hang up current call"""
         try:
-            if not self.active_call and not self.incoming_call and self.call_state == "IDLE":
+            if not self.active_call and not self.incoming_call and self.call_state == CallState.IDLE:
                 self.logger.outgoing_error("Нет активного звонка для завершения")
                 return False
                 
@@ -1358,16 +1640,12 @@ class SIPClient:
     def _send_bye_sync(self):
         """Send authenticated BYE message to hang up call"""
         try:
-            server = self.sip_config['sip_server']
-            port = self.sip_config['sip_port']
-            
             # Build authenticated BYE
             bye_msg = self._build_authorized_bye()
             
-            self.logger.outgoing_debug(f"BYE:\n{bye_msg}")
+            self._log_outgoing_message("BYE", bye_msg)
             
-            self.sip_socket.sendto(bye_msg.encode(), (server, port))
-            self.messages_sent += 1
+            self._send(bye_msg, self._server_addr)
             self.logger.outgoing_debug("BYE отправлен")
             
         except Exception as e:
@@ -1377,29 +1655,19 @@ class SIPClient:
         """Send 486 Busy Here response for incoming call"""
         try:
             server = self.sip_config['sip_server']
-            port = self.sip_config['sip_port']
             local_ip = self._get_local_ip()
             
-            # Extract headers from stored INVITE message
-            lines = []
-            lines.append("SIP/2.0 486 Busy Here")
-            lines.append(f"Via: SIP/2.0/UDP {local_ip}:5060;branch=z9hG4bK{random.getrandbits(32)};rport")
-            lines.append(f"From: <sip:{self.caller_number}@{server}>;tag={self.from_tag}")
-            lines.append(f"To: <sip:{self.sip_config['number']}@{server}>;tag={self._generate_tag()}")
-            lines.append(f"Call-ID: {self.current_call_id}")
-            lines.append(f"CSeq: {self.cseq_counter} INVITE")
-            lines.append(f"Contact: <sip:{self.sip_config['login']}@{local_ip}:5060>")
-            lines.append("User-Agent: SIPGateway/1.0")
-            lines.append("Content-Length: 0")
-            lines.append("")
-            lines.append("")
-
-            response = "\r\n".join(lines)
-            
-            self.logger.outgoing_debug(f"Отправка 486 Busy Here:\n{response}")
-            
-            self.sip_socket.sendto(response.encode(), (server, port))
-            self.messages_sent += 1
+            # Build from the stored INVITE state
+            response = _BUSY_TMPL % (
+                local_ip, self._generate_branch(),
+                self.caller_number, server, self.from_tag,
+                self.sip_config['number'], server, self._generate_tag(),
+                self.current_call_id, self.cseq_counter,
+                self.sip_config['login'], local_ip)
+            
+            self.logger.outgoing_debug("Отправка 486 Busy Here:\n%s", response)
+            
+            self._send(response.encode(), self._server_addr)
             self.logger.outgoing_info("Отправлен ответ 486 Busy Here")
             
         except Exception as e:
@@ -1413,7 +1681,7 @@ class SIPClient:
                 return False
                 
             # Здесь будет реализация отправки DTMF
-            self.logger.outgoing_info(f"Отправка DTMF: {digit}")
+            self.logger.outgoing_info("Отправка DTMF: %s", digit)
             return True
             
         except Exception as e:
@@ -1427,18 +1695,14 @@ class SIPClient:
                 self.logger.outgoing_error("Не зарегистрирован на SIP сервере")
                 return False
             
-            self.logger.outgoing_info(f"Отправка сообщения на номер: {to_number}")
+            self.logger.outgoing_info("Отправка сообщения на номер: %s", to_number)
             
             # Build authenticated MESSAGE
             message_text = self._build_authorized_message(to_number, content)
             
-            server = self.sip_config['sip_server']
-            port = self.sip_config['sip_port']
-            
-            self.sip_socket.sendto(message_text.encode(), (server, port))
-            self.messages_sent += 1
+            self._send(message_text, self._server_addr)
             
-            self.logger.outgoing_info(f"Авторизованное MESSAGE отправлено на {to_number}")
+            self.logger.outgoing_info("Авторизованное MESSAGE отправлено на %s", to_number)
             return True
             
         except Exception as e:
@@ -1447,42 +1711,55 @@ class SIPClient:
 
     async def _cleanup_call(self):
         """Clean up call state"""
-        self.active_call = False
-        self.incoming_call = False
-        self.caller_number = ""
-        self.dialed_number = ""
-        self.current_call_id = None
-        self.to_tag = None
-        self.call_state = "IDLE"
+        self._reset_call_state()
         
         if self.websocket_bridge:
             await self.websocket_bridge.notify_call_ended()
 
     def _reset_call_state(self):
         """Reset call state without sending BYE"""
-        self.active_call = False
-        self.incoming_call = False
-        self.caller_number = ""
-        self.dialed_number = ""
-        self.current_call_id = None
-        self.to_tag = None
-        self.call_state = "IDLE"
+        # One swap, so the I/O thread never sees a half-reset call
+        self._call = _CallInfo()
 
     def _generate_call_id(self) -> str:
         """Generate unique Call-ID"""
-        return f"{random.getrandbits(32)}@{self._get_local_ip()}"
+        suffix = self._call_id_suffix
+        if not suffix:
+            # Not registered yet - probe (and cache) the local IP
+            suffix = "@" + self._get_local_ip()
+        return self._rand_hex(4) + suffix
 
     def _generate_tag(self) -> str:
         """Generate unique tag"""
-        return f"{random.getrandbits(32)}"
+        return self._rand_hex(4)
+
+    def _generate_branch(self) -> str:
+        """Generate RFC 3261 Via branch (magic cookie + 48 random bits)"""
+        return "z9hG4bK" + self._rand_hex(6)
+
+    def _rand_hex(self, nbytes: int) -> str:
+        """Hex string of nbytes random bytes taken from the urandom pool"""
+        with self._rand_lock:
+            off = self._rand_off
+            if off + nbytes > len(self._rand_pool):
+                self._rand_pool[:] = os.urandom(len(self._rand_pool))
+                off = 0
+            self._rand_off = off + nbytes
+            return self._rand_pool[off:off + nbytes].hex()
 
     def _get_local_ip(self) -> str:
-        """Get local IP address"""
+        """Get local IP address (cached)"""
+        if self._local_ip is None:
+            self._local_ip = self._compute_local_ip()
+        return self._local_ip
+
+    def _compute_local_ip(self) -> str:
+        """Probe the local IP address via a connected UDP socket"""
         try:
             with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
                 s.connect(("8.8.8.8", 80))
                 return s.getsockname()[0]
-        except:
+        except OSError:
             return "127.0.0.1"
 
     async def disconnect(self):
@@ -1490,31 +1767,58 @@ class SIPClient:
         try:
             self.running = False
             
+            if self._keepalive_task:
+                self._keepalive_task.cancel()
+                self._keepalive_task = None
+            
+            # Stop the I/O thread; BYE/UNREGISTER are flushed below
+            self._wake_io()
+            
             if self.active_call or self.incoming_call:
                 await self.hangup_call()
             
-            # Send unregister
-            if self.registered and self.sip_socket:
+            # Queue unregister; it goes out with the final flush below
+            unregistered = self.registered and self.sip_socket is not None
+            if unregistered:
                 self.cseq_counter += 1
-                unregister_msg = self._build_register_message(with_auth=True)
-                unregister_msg = unregister_msg.replace("Expires: 3600", "Expires: 0")
-                self.sip_socket.sendto(unregister_msg.encode(), 
-                                    (self.sip_config['sip_server'], self.sip_config['sip_port']))
-                self.messages_sent += 1
-                self.logger.outgoing_info("UNREGISTER отправлен")
-            
+                unregister_msg = self._build_register_message(with_auth=True, expires=0)
+                self._send(unregister_msg, self._server_addr)
+            
+            # Wait for the I/O thread to exit (without blocking the event
+            # loop), then send whatever is queued and close - back to back,
+            # and the socket is closed even if the flush fails
+            if self.io_thread:
+                await asyncio.to_thread(self.io_thread.join, 1.0)
+                self.io_thread = None
+            with self._io_lock:
+                if self.sip_socket and self._io_ident is not None:
+                    # The I/O thread is still running and may be flushing the
+                    # same queue - don't race it; it closes the socket on exit
+                    self.logger.outgoing_warning(
+                        "I/O поток не завершился за 1 с, финальная отправка пропущена")
+                    self._tx_queue.clear()
+                    self.sip_socket = None
+                    unregistered = False
             if self.sip_socket:
-                self.sip_socket.close()
-                self.sip_socket = None
+                try:
+                    self._flush_tx_queue()
+                finally:
+                    self.sip_socket.close()
+                    self.sip_socket = None
             
             self.registered = False
+            # Re-probed on the next register(), the route may have changed
+            self._local_ip = None
+            self._call_id_suffix = ""
             
             # Clear auth cache on disconnect
             self.clear_auth_cache()
             
-            # Log statistics
-            self.logger.outgoing_info(f"Статистика: отправлено {self.messages_sent} сообщений, получено {self.messages_received} сообщений")
-            self.logger.outgoing_info("Отключение от SIP сервера завершено")
+            # One record for UNREGISTER + statistics, after the socket is closed
+            self.logger.outgoing_info(
+                "Отключение от SIP сервера завершено%s: отправлено %s сообщений, получено %s сообщений",
+                " (UNREGISTER отправлен)" if unregistered else "",
+                self.messages_sent, self.messages_received)
             
             # Notify WebSocket bridge about unregistration
             if self.websocket_bridge:
@@ -1535,16 +1839,18 @@ class SIPClient:
 
     def get_status(self) -> Dict:
         """Get client status"""
+        # Call fields from one _CallInfo snapshot: no property hops, and a
+        # concurrent reset on the I/O thread cannot mix two calls
+        call = self._call
         return {
             'registered': self.registered,
-            'in_call': self.active_call,
-            'has_incoming': self.incoming_call,
-            'caller_number': self.caller_number,
-            'dialed_number': self.dialed_number,
-            'call_id': self.current_call_id,
-            'call_state': self.call_state,
-            'sip_server': self.sip_config.get('sip_server', ''),
-            'number': self.sip_config.get('number', ''),
+            'in_call': call.active,
+            'has_incoming': call.incoming,
+            'caller_number': call.caller,
+            'dialed_number': call.dialed,
+            'call_id': call.call_id,
+            'call_state': call.state.name,
+            **self._status_account,
             'messages_sent': self.messages_sent,
             'messages_received': self.messages_received,
             'last_options_response': self.last_options_response,
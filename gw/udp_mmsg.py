@@ -0,0 +1,161 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import socket
+import sys
+from typing import List, Tuple
+
+# Batched UDP I/O via Linux sendmmsg(2)/recvmmsg(2) through ctypes.
+# HAVE_MMSG is False elsewhere (or without a usable libc) and callers fall
+# back to plain sendto/recvfrom.
+
+BATCH_SIZE = 32
+
+
+class _IOVec(ctypes.Structure):
+    _fields_ = [
+        ('iov_base', ctypes.c_void_p),
+        ('iov_len', ctypes.c_size_t),
+    ]
+
+
+class _MsgHdr(ctypes.Structure):
+    _fields_ = [
+        ('msg_name', ctypes.c_void_p),
+        ('msg_namelen', ctypes.c_uint32),
+        ('msg_iov', ctypes.POINTER(_IOVec)),
+        ('msg_iovlen', ctypes.c_size_t),
+        ('msg_control', ctypes.c_void_p),
+        ('msg_controllen', ctypes.c_size_t),
+        ('msg_flags', ctypes.c_int),
+    ]
+
+
+class _MMsgHdr(ctypes.Structure):
+    _fields_ = [
+        ('msg_hdr', _MsgHdr),
+        ('msg_len', ctypes.c_uint),
+    ]
+
+
+class _SockAddrIn(ctypes.Structure):
+    _fields_ = [
+        ('sin_family', ctypes.c_ushort),
+        ('sin_port', ctypes.c_uint16),
+        ('sin_addr', ctypes.c_uint8 * 4),
+        ('sin_zero', ctypes.c_uint8 * 8),
+    ]
+
+
+def _load_libc():
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.sendmmsg
+        libc.recvmmsg
+    except (OSError, AttributeError):
+        return None
+    libc.sendmmsg.argtypes = [ctypes.c_int, ctypes.POINTER(_MMsgHdr), ctypes.c_uint, ctypes.c_int]
+    libc.sendmmsg.restype = ctypes.c_int
+    libc.recvmmsg.argtypes = [ctypes.c_int, ctypes.POINTER(_MMsgHdr), ctypes.c_uint, ctypes.c_int, ctypes.c_void_p]
+    libc.recvmmsg.restype = ctypes.c_int
+    return libc
+
+
+_libc = _load_libc()
+HAVE_MMSG = _libc is not None
+
+
+def _sockaddr_in(addr: Tuple[str, int]) -> _SockAddrIn:
+    """Build a sockaddr_in; raises OSError if host is not an IPv4 literal"""
+    sa = _SockAddrIn()
+    sa.sin_family = socket.AF_INET
+    sa.sin_port = socket.htons(addr[1])
+    sa.sin_addr[:] = socket.inet_aton(addr[0])
+    return sa
+
+
+class SendBatch:
+    """Preallocated headers for sending up to BATCH_SIZE datagrams per sendmmsg.
+
+    Payload bytes are referenced in place (no copy); sockaddr_in structs are
+    cached per destination.
+    """
+    def __init__(self, count: int = BATCH_SIZE):
+        self.count = count
+        self._msgs = (_MMsgHdr * count)()
+        self._iovs = (_IOVec * count)()
+        self._addrs = (_SockAddrIn * count)()
+        self._addr_cache = {}
+        for i in range(count):
+            hdr = self._msgs[i].msg_hdr
+            hdr.msg_name = ctypes.cast(ctypes.pointer(self._addrs[i]), ctypes.c_void_p)
+            hdr.msg_namelen = ctypes.sizeof(_SockAddrIn)
+            hdr.msg_iov = ctypes.pointer(self._iovs[i])
+            hdr.msg_iovlen = 1
+
+    def _sockaddr(self, addr: Tuple[str, int]) -> _SockAddrIn:
+        sa = self._addr_cache.get(addr)
+        if sa is None:
+            if len(self._addr_cache) >= 256:
+                self._addr_cache.clear()
+            sa = self._addr_cache[addr] = _sockaddr_in(addr)
+        return sa
+
+    def send(self, sock: socket.socket, batch: List[Tuple[bytes, Tuple[str, int]]], flags: int = 0) -> int:
+        """Send up to count (payload, (ip, port)) datagrams in one syscall.
+
+        Returns the number of datagrams the kernel accepted, which may be fewer
+        than len(batch); raises OSError if not even the first one was sent.
+        """
+        n = min(len(batch), self.count)
+        keep = []
+        for i in range(n):
+            payload, addr = batch[i]
+            buf = ctypes.c_char_p(payload)
+            keep.append(buf)
+            self._iovs[i].iov_base = ctypes.cast(buf, ctypes.c_void_p)
+            self._iovs[i].iov_len = len(payload)
+            self._addrs[i] = self._sockaddr(addr)
+        sent = _libc.sendmmsg(sock.fileno(), self._msgs, n, flags)
+        if sent < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        return sent
+
+
+class RecvBatch:
+    """Preallocated buffers for receiving up to BATCH_SIZE datagrams per recvmmsg"""
+    def __init__(self, bufsize: int = 4096, count: int = BATCH_SIZE):
+        self.count = count
+        self.bufs = [bytearray(bufsize) for _ in range(count)]
+        self._views = [memoryview(buf) for buf in self.bufs]
+        self._msgs = (_MMsgHdr * count)()
+        self._iovs = (_IOVec * count)()
+        self._addrs = (_SockAddrIn * count)()
+        for i, buf in enumerate(self.bufs):
+            self._iovs[i].iov_base = ctypes.addressof((ctypes.c_char * bufsize).from_buffer(buf))
+            self._iovs[i].iov_len = bufsize
+            hdr = self._msgs[i].msg_hdr
+            hdr.msg_name = ctypes.cast(ctypes.pointer(self._addrs[i]), ctypes.c_void_p)
+            hdr.msg_iov = ctypes.pointer(self._iovs[i])
+            hdr.msg_iovlen = 1
+
+    def recv(self, sock: socket.socket, flags: int = 0) -> List[Tuple[bytes, Tuple[str, int]]]:
+        """Receive a batch of (payload, (ip, port)); empty if nothing is queued"""
+        for i in range(self.count):
+            self._msgs[i].msg_hdr.msg_namelen = ctypes.sizeof(_SockAddrIn)
+        n = _libc.recvmmsg(sock.fileno(), self._msgs, self.count, flags, None)
+        if n < 0:
+            err = ctypes.get_errno()
+            if err in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                return []
+            raise OSError(err, os.strerror(err))
+        out = []
+        for i in range(n):
+            sa = self._addrs[i]
+            addr = (socket.inet_ntoa(bytes(sa.sin_addr)), socket.ntohs(sa.sin_port))
+            out.append((bytes(self._views[i][:self._msgs[i].msg_len]), addr))
+        return out
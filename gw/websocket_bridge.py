@@ -17,6 +17,20 @@ class WebSocketBridge:
         self.sip_connected = False
         self.sip_registered = False
         
+        # Notifications posted from the SIP I/O thread, drained on our loop
+        self._loop = None
+        self._event_q = None
+        self._event_task = None
+        self._event_handlers = {
+            "sip_registered": self.notify_sip_registered,
+            "sip_unregistered": self.notify_sip_unregistered,
+            "incoming_call": self.notify_incoming_call,
+            "call_answered": self.notify_call_answered,
+            "call_ended": self.notify_call_ended,
+            "call_failed": self.notify_call_failed,
+            "call_ringing": self.notify_call_ringing,
+        }
+        
     def set_sip_client(self, sip_client):
         """Установить ссылку на SIP клиент для обратной связи"""
         self.sip_client = sip_client
@@ -29,6 +43,9 @@ class WebSocketBridge:
                 self.host,
                 self.port
             )
+            self._loop = asyncio.get_running_loop()
+            self._event_q = asyncio.Queue()
+            self._event_task = asyncio.create_task(self._event_pump())
             self.logger.info(f"WebSocket сервер запущен на ws://{self.host}:{self.port}")
             
             if self.logger.isEnabledFor(logging.DEBUG):
@@ -41,6 +58,9 @@ class WebSocketBridge:
             
     async def stop_server(self):
         """Остановка WebSocket сервера"""
+        if self._event_task:
+            self._event_task.cancel()
+            self._event_task = None
         if hasattr(self, 'server'):
             self.server.close()
             await self.server.wait_closed()
@@ -396,6 +416,31 @@ class WebSocketBridge:
     
     # === Методы для уведомлений от SIP клиента ===
     
+    def post_event(self, kind: str, arg=None):
+        """Queue a notification from any thread; sent by the event pump.
+        
+        A plain call_soon_threadsafe instead of run_coroutine_threadsafe:
+        no concurrent Future and no coroutine per SIP state change.
+        """
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            self.logger.outgoing_debug("Уведомление %s пропущено: сервер не запущен", kind)
+            return
+        loop.call_soon_threadsafe(self._event_q.put_nowait, (kind, arg))
+    
+    async def _event_pump(self):
+        """Send queued notifications in the order they were posted"""
+        while True:
+            kind, arg = await self._event_q.get()
+            try:
+                handler = self._event_handlers[kind]
+                if arg is None:
+                    await handler()
+                else:
+                    await handler(arg)
+            except Exception as e:
+                self.logger.outgoing_error(f"Ошибка отправки уведомления {kind}: {e}")
+    
     async def notify_sip_registered(self):
         """Уведомление о успешной регистрации SIP"""
         self.sip_registered = True
@@ -486,7 +531,7 @@ class WebSocketBridge:
         for client in self.connected_clients:
             try:
                 clients_info.append(f"{client.remote_address[0]}:{client.remote_address[1]}")
-            except:
+            except (TypeError, IndexError):  # remote_address is None once closed
                 clients_info.append("unknown")
         return clients_info
 